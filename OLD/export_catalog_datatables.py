@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Whole-catalog DataTables export
+Hakee koko pelaaja- ja maalivahtitaulukon kerran ja jakaa rivit paikallisesti
+kansallisuus-, joukkue- ja liigakohtaisiin tiedostoihin yhdellä läpikäynnillä
+
+Output layout:
+    <out>/nationality/finland.json, <out>/team/ana.json, <out>/league/nhl.json, ...
+    <out>/manifest.json   counts per partition (skaters / goalies)
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import scrape_country_datatables as skaters
+import scrape_goalies_country_datatables as goalies
+from utils_fetch import iter_datatables_pages, project_columns
+from utils_stream import PartitionWriter, clean_pages, iter_ndjson, write_json_array
+
+PARTITION_FIELDS = ('nationality', 'team', 'league')
+
+def slugify(value: str) -> str:
+    # Same lower-case file naming enrich_country_xfactors.py uses for <country>.json
+    slug = re.sub(r'\W+', '_', value.strip().lower()).strip('_')
+    return slug or '_'
+
+def run(out_dir: str, workers: int = 1, concurrency: int = 4, columns: list = None):
+    if columns:
+        columns = project_columns(columns, dict.fromkeys(PARTITION_FIELDS))
+    work_dir = os.path.join(out_dir, '.partial')
+    writer = PartitionWriter(work_dir)
+    partitions = {}
+    unassigned = {field: 0 for field in PARTITION_FIELDS}
+    totals = {}
+
+    try:
+        for kind, module in (('skaters', skaters), ('goalies', goalies)):
+            pages = iter_datatables_pages(
+                lambda start, length, m=module: m.fetch_page(start, length, None, columns=columns),
+                workers=concurrency,
+                on_page=lambda fetched, total, k=kind: print(f"Fetched {k} {fetched} / {total}"),
+            )
+            totals[kind] = 0
+            for cleaned in clean_pages(pages, workers):
+                for row in cleaned:
+                    keys = []
+                    for field in PARTITION_FIELDS:
+                        value = str(row.get(field) or '').strip()
+                        if not value:
+                            unassigned[field] += 1
+                            continue
+                        key = f'{field}/{slugify(value)}'
+                        keys.append(key)
+                        info = partitions.get(key)
+                        if info is None:
+                            info = partitions[key] = {'field': field, 'names': [], 'skaters': 0, 'goalies': 0}
+                        if value not in info['names']:
+                            info['names'].append(value)
+                        info[kind] += 1
+                    writer.write(keys, row)
+                totals[kind] += len(cleaned)
+    except Exception:
+        writer.close()
+        print(f"Partial partitions kept in {work_dir}")
+        raise
+    writer.close()
+
+    # Replace partitions from any previous export, then convert NDJSON -> JSON arrays
+    for field in PARTITION_FIELDS:
+        shutil.rmtree(os.path.join(out_dir, field), ignore_errors=True)
+    manifest = {
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'totals': totals,
+        'unassigned': unassigned,
+        'partitions': {field: {} for field in PARTITION_FIELDS},
+    }
+    for key in sorted(partitions):
+        info = partitions[key]
+        out_path = os.path.join(out_dir, f'{key}.json')
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        write_json_array(out_path, iter_ndjson(writer.path(key)))
+        manifest['partitions'][info['field']][key.split('/', 1)[1]] = {
+            'file': f'{key}.json',
+            'names': info['names'],
+            'skaters': info['skaters'],
+            'goalies': info['goalies'],
+        }
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    print(f"Saved {totals.get('skaters', 0)} skaters and {totals.get('goalies', 0)} goalies "
+          f"into {len(partitions)} partitions under {out_dir}")
+    return manifest
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--out', default='catalog', help='Output directory (default: catalog)')
+    ap.add_argument('--columns', help='Comma-separated columns to request; partition columns are always added')
+    ap.add_argument('--concurrency', type=int, default=4, help='Parallel page requests after the first one')
+    ap.add_argument('--workers', type=int, default=1, help='Clean rows in N processes (0 = all cores)')
+    args = ap.parse_args()
+    columns = [c.strip() for c in args.columns.split(',') if c.strip()] if args.columns else None
+    try:
+        run(args.out, args.workers, args.concurrency, columns)
+    except Exception as e:
+        print(f"Failed: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import os
 import sys
-import time
 import requests
-from utils_clean import clean_common_fields
+from utils_fetch import datatables_payload, iter_datatables_pages, project_columns, project_rows
+from utils_stream import partial_path, stream_to_json
 
 DT_URL = "https://nhlhutbuilder.com/php/player_stats.php"
 
@@ -15,70 +15,60 @@ HEADERS = {
     'Referer': 'https://nhlhutbuilder.com/player-stats.php',
 }
 
-def fetch_page(start: int, length: int, nationality: str, position: str = None, team: str = None):
-    payload = {
-        'draw': 1,
-        'start': start,
-        'length': length,
-        'search[value]': '',
-        'search[regex]': 'false',
-        'nationality': nationality,
-    }
-    columns = [
-        'card_art','card','nationality','league','team','division','salary','position','hand','weight','height','full_name','overall','aOVR',
-        'acceleration','agility','balance','endurance','speed','slap_shot_accuracy','slap_shot_power','wrist_shot_accuracy','wrist_shot_power',
-        'deking','off_awareness','hand_eye','passing','puck_control','body_checking','strength','aggression','durability','fighting_skill',
-        'def_awareness','shot_blocking','stick_checking','faceoffs','discipline','date_added','date_updated'
-    ]
-    for idx, name in enumerate(columns):
-        payload[f'columns[{idx}][data]'] = name
-        payload[f'columns[{idx}][name]'] = name
-        payload[f'columns[{idx}][searchable]'] = 'true'
-        payload[f'columns[{idx}][orderable]'] = 'true'
-        payload[f'columns[{idx}][search][value]'] = ''
-        payload[f'columns[{idx}][search][regex]'] = 'false'
-    payload['columns[2][search][value]'] = nationality
-    payload['columns[2][search][regex]'] = 'false'
-    
-    # Add position filter if specified
+ALL_COLUMNS = [
+    'card_art','card','nationality','league','team','division','salary','position','hand','weight','height','full_name','overall','aOVR',
+    'acceleration','agility','balance','endurance','speed','slap_shot_accuracy','slap_shot_power','wrist_shot_accuracy','wrist_shot_power',
+    'deking','off_awareness','hand_eye','passing','puck_control','body_checking','strength','aggression','durability','fighting_skill',
+    'def_awareness','shot_blocking','stick_checking','faceoffs','discipline','date_added','date_updated'
+]
+
+# Enough to spot new or changed cards: player_id comes from the full_name link
+SYNC_COLUMNS = ['full_name', 'overall', 'salary', 'date_updated']
+
+def fetch_page(start: int, length: int, nationality: str, position: str = None, team: str = None,
+               columns: list = None):
+    # columns=None requests the full table; a list projects the request and the rows to those
+    # columns (filter columns are always included so the nationality check still works)
+    # nationality=None pulls the whole catalog (see export_catalog_datatables.py)
+    searches = {'nationality': nationality} if nationality else {}
+    # Add position / team filters if specified
     if position:
-        payload['columns[7][search][value]'] = position  # position is column 7
-        payload['columns[7][search][regex]'] = 'false'
-    
-    # Add team filter if specified
+        searches['position'] = position
     if team:
-        payload['columns[4][search][value]'] = team  # team is column 4
-        payload['columns[4][search][regex]'] = 'false'
+        searches['team'] = team
+    selected = project_columns(columns, searches) if columns else ALL_COLUMNS
+    payload = datatables_payload(selected, searches, start, length, minimal=bool(columns))
+    if nationality:
+        payload['nationality'] = nationality
     resp = requests.post(DT_URL, data=payload, headers=HEADERS, timeout=30)
     resp.raise_for_status()
-    return resp.json()
-
-def run(nationality: str, out_path: str, position: str = None, team: str = None):
-    start = 0
-    length = 200
-    all_rows = []
-
-    # First page
-    data = fetch_page(start, length, nationality, position, team)
-    total = data.get('recordsFiltered') or data.get('recordsTotal') or 0
-    rows = data.get('data') or []
-    all_rows.extend(rows)
-    print(f"Fetched {len(rows)} / {total}")
-
-    while len(all_rows) < total:
-        start += length
-        time.sleep(0.3)
-        data = fetch_page(start, length, nationality, position, team)
-        rows = data.get('data') or []
-        all_rows.extend(rows)
-        print(f"Fetched {len(all_rows)} / {total}")
+    data = resp.json()
+    if columns:
+        data['data'] = project_rows(data.get('data') or [], selected)
+    return data
 
-    cleaned = [clean_common_fields(r) for r in all_rows]
-    cleaned = [r for r in cleaned if (r.get('nationality') or '').strip().lower() == nationality.lower()]
+def iter_pages(nationality: str, position: str = None, team: str = None, concurrency: int = 4,
+               columns: list = None):
+    # First response gives recordsFiltered and tunes the page length; the remaining
+    # offsets are fetched concurrently under the shared rate limit and yielded in order
+    return iter_datatables_pages(
+        lambda start, length: fetch_page(start, length, nationality, position, team, columns),
+        workers=concurrency,
+        on_page=lambda fetched, total: print(f"Fetched {fetched} / {total}"),
+    )
 
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(cleaned, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(cleaned)} players to {out_path}")
+def run(nationality: str, out_path: str, position: str = None, team: str = None, workers: int = 1,
+        concurrency: int = 4, columns: list = None):
+    # Pages are cleaned and appended to <out>.partial.ndjson as they arrive; the JSON array is
+    # written from that file at the end, so a crash leaves everything fetched so far on disk.
+    wanted = nationality.lower()
+    saved = stream_to_json(
+        iter_pages(nationality, position, team, concurrency, columns),
+        out_path,
+        keep=lambda r: (r.get('nationality') or '').strip().lower() == wanted,
+        workers=workers,
+    )
+    print(f"Saved {saved} players to {out_path}")
 
 def main():
     ap = argparse.ArgumentParser()
@@ -86,11 +76,20 @@ def main():
     ap.add_argument('--out', required=True, help='Output JSON path (e.g., austria.json)')
     ap.add_argument('--position', help='Position filter (e.g., LW, RW, C, D, G)')
     ap.add_argument('--team', help='Team filter (e.g., ANA, BOS, CHI)')
+    ap.add_argument('--columns', help='Comma-separated columns to request (e.g., full_name,overall,salary)')
+    ap.add_argument('--sync', action='store_true', help=f"Request only {','.join(SYNC_COLUMNS)}")
+    ap.add_argument('--concurrency', type=int, default=4, help='Parallel page requests after the first one')
+    ap.add_argument('--workers', type=int, default=1, help='Clean rows in N processes for large pulls (0 = all cores)')
     args = ap.parse_args()
+    columns = SYNC_COLUMNS if args.sync else None
+    if args.columns:
+        columns = [c.strip() for c in args.columns.split(',') if c.strip()]
     try:
-        run(args.nationality, args.out, args.position, args.team)
+        run(args.nationality, args.out, args.position, args.team, args.workers, args.concurrency, columns)
     except Exception as e:
         print(f"Failed: {e}")
+        if os.path.exists(partial_path(args.out)):
+            print(f"Partial results kept in {partial_path(args.out)}")
         sys.exit(1)
 
 if __name__ == '__main__':
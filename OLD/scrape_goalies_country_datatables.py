@@ -1,10 +1,10 @@
 #!/usr/bin/env python3
 import argparse
-import json
+import os
 import sys
-import time
 import requests
-from utils_clean import clean_common_fields
+from utils_fetch import datatables_payload, iter_datatables_pages, project_columns, project_rows
+from utils_stream import partial_path, stream_to_json
 
 DT_URL = "https://nhlhutbuilder.com/php/goalie_stats.php"
 
@@ -15,65 +15,67 @@ HEADERS = {
     'Referer': 'https://nhlhutbuilder.com/goalie-stats.php',
 }
 
-def fetch_page(start: int, length: int, nationality: str):
-    payload = {
-        'draw': 1,
-        'start': start,
-        'length': length,
-        'search[value]': '',
-        'search[regex]': 'false',
-        'nationality': nationality,
-    }
-    columns = [
-        'card_art','card','nationality','league','team','division','salary','hand','weight','height','full_name','overall','aOVR',
-        'glove_high','glove_low','stick_high','stick_low','shot_recovery','aggression','agility','speed','positioning','breakaway',
-        'vision','poke_check','rebound_control','passing','date_added','date_updated'
-    ]
-    for idx, name in enumerate(columns):
-        payload[f'columns[{idx}][data]'] = name
-        payload[f'columns[{idx}][name]'] = name
-        payload[f'columns[{idx}][searchable]'] = 'true'
-        payload[f'columns[{idx}][orderable]'] = 'true'
-        payload[f'columns[{idx}][search][value]'] = ''
-        payload[f'columns[{idx}][search][regex]'] = 'false'
-    payload['columns[2][search][value]'] = nationality
-    payload['columns[2][search][regex]'] = 'false'
+ALL_COLUMNS = [
+    'card_art','card','nationality','league','team','division','salary','hand','weight','height','full_name','overall','aOVR',
+    'glove_high','glove_low','stick_high','stick_low','shot_recovery','aggression','agility','speed','positioning','breakaway',
+    'vision','poke_check','rebound_control','passing','date_added','date_updated'
+]
+
+# Enough to spot new or changed cards: player_id comes from the full_name link
+SYNC_COLUMNS = ['full_name', 'overall', 'salary', 'date_updated']
+
+def fetch_page(start: int, length: int, nationality: str, columns: list = None):
+    # columns=None requests the full table; a list projects the request and the rows to those
+    # columns (filter columns are always included so the nationality check still works)
+    # nationality=None pulls the whole catalog (see export_catalog_datatables.py)
+    searches = {'nationality': nationality} if nationality else {}
+    selected = project_columns(columns, searches) if columns else ALL_COLUMNS
+    payload = datatables_payload(selected, searches, start, length, minimal=bool(columns))
+    if nationality:
+        payload['nationality'] = nationality
     resp = requests.post(DT_URL, data=payload, headers=HEADERS, timeout=30)
     resp.raise_for_status()
-    return resp.json()
+    data = resp.json()
+    if columns:
+        data['data'] = project_rows(data.get('data') or [], selected)
+    return data
+
+def iter_pages(nationality: str, concurrency: int = 4, columns: list = None):
+    return iter_datatables_pages(
+        lambda start, length: fetch_page(start, length, nationality, columns),
+        workers=concurrency,
+        on_page=lambda fetched, total: print(f"Fetched goalies {fetched} / {total}"),
+    )
 
-def run(nationality: str):
-    start = 0
-    length = 200
-    all_rows = []
-    data = fetch_page(start, length, nationality)
-    total = data.get('recordsFiltered') or data.get('recordsTotal') or 0
-    rows = data.get('data') or []
-    all_rows.extend(rows)
-    print(f"Fetched goalies {len(rows)} / {total}")
-    while len(all_rows) < total:
-        start += length
-        time.sleep(0.3)
-        data = fetch_page(start, length, nationality)
-        rows = data.get('data') or []
-        all_rows.extend(rows)
-        print(f"Fetched goalies {len(all_rows)} / {total}")
-    cleaned = [clean_common_fields(r) for r in all_rows]
-    cleaned = [r for r in cleaned if (r.get('nationality') or '').strip().lower() == nationality.lower()]
-    return cleaned
+def run(nationality: str, out_path: str, workers: int = 1, concurrency: int = 4, columns: list = None):
+    # Streams pages through <out>.partial.ndjson, see scrape_country_datatables.run
+    wanted = nationality.lower()
+    return stream_to_json(
+        iter_pages(nationality, concurrency, columns),
+        out_path,
+        keep=lambda r: (r.get('nationality') or '').strip().lower() == wanted,
+        workers=workers,
+    )
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--nationality', required=True)
     ap.add_argument('--out', required=True)
+    ap.add_argument('--columns', help='Comma-separated columns to request (e.g., full_name,overall,salary)')
+    ap.add_argument('--sync', action='store_true', help=f"Request only {','.join(SYNC_COLUMNS)}")
+    ap.add_argument('--concurrency', type=int, default=4, help='Parallel page requests after the first one')
+    ap.add_argument('--workers', type=int, default=1, help='Clean rows in N processes for large pulls (0 = all cores)')
     args = ap.parse_args()
+    columns = SYNC_COLUMNS if args.sync else None
+    if args.columns:
+        columns = [c.strip() for c in args.columns.split(',') if c.strip()]
     try:
-        cleaned = run(args.nationality)
-        with open(args.out, 'w', encoding='utf-8') as f:
-            json.dump(cleaned, f, ensure_ascii=False, indent=2)
-        print(f"Saved {len(cleaned)} goalies to {args.out}")
+        saved = run(args.nationality, args.out, args.workers, args.concurrency, columns)
+        print(f"Saved {saved} goalies to {args.out}")
     except Exception as e:
         print(f"Failed: {e}")
+        if os.path.exists(partial_path(args.out)):
+            print(f"Partial results kept in {partial_path(args.out)}")
         sys.exit(1)
 
 if __name__ == '__main__':
@@ -4,9 +4,9 @@ X-Factor Tier Analyzer - Analyzes X-Factor abilities by tier (Specialist, All-St
 """
 
 import json
-import time
 import requests
 from bs4 import BeautifulSoup
+from utils_xfactor_cache import XFactorCache
 
 PLAYER_URL = "https://nhlhutbuilder.com/player-stats.php?id={pid}"
 
@@ -17,7 +17,7 @@ HEADERS = {
 }
 
 def fetch_player_xfactors_detailed(pid: int):
-    """Fetch detailed X-Factor abilities with tier information"""
+    """Fetch detailed X-Factor abilities with tier information; None if the fetch failed"""
     url = PLAYER_URL.format(pid=pid)
     
     try:
@@ -70,7 +70,7 @@ def fetch_player_xfactors_detailed(pid: int):
         
     except Exception as e:
         print(f"Error fetching X-Factors for player {pid}: {e}")
-        return []
+        return None
 
 def analyze_xfactor_tiers():
     """Analyze X-Factor tiers across different players"""
@@ -87,15 +87,22 @@ def analyze_xfactor_tiers():
     
     all_abilities = {}
     tier_counts = {"Specialist": 0, "All-Star": 0, "Elite": 0, "Unknown": 0}
+    # Detailed records (category, description) are cached separately from the enricher's lists
+    cache = XFactorCache()
     
     for player_info in test_players:
         name = player_info["name"]
         pid = player_info["pid"]
         
         print(f"Analyzing {name} (ID: {pid})...")
-        abilities = fetch_player_xfactors_detailed(pid)
+        # Sleeps 1 s after a real fetch to be nice to server
+        abilities = cache.get_or_fetch(pid, False, lambda: fetch_player_xfactors_detailed(pid),
+                                       variant='detailed', delay=1)
         
-        if abilities:
+        if abilities is None:
+            # Not cached, so the next run retries this player
+            print(f"  Fetch failed, skipping")
+        elif abilities:
             print(f"  Found {len(abilities)} X-Factor abilities:")
             for ability in abilities:
                 print(f"    - {ability['name']} ({ability['tier']}, {ability['ap_cost']} AP)")
@@ -118,7 +125,7 @@ def analyze_xfactor_tiers():
             print(f"  No X-Factor abilities found")
         
         print()
-        time.sleep(1)  # Be nice to server
+    cache.save()
     
     # Summary
     print("=== X-Factor Tier Summary ===")
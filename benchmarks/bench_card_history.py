@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Card history record / compact benchmark with a compact-then-query check
+Tallentaa synteettisen katalogin päivityksiä historiaan, tiivistää vanhat deltat ja
+varmistaa, että nykytila ja tiivistysrajan jälkeiset kenttämuutokset pysyvät ennallaan
+
+Usage: python -m benchmarks.bench_card_history [--cards N] [--refreshes N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_master_snapshot import STATS, make_catalog
+from utils_card_history import CardHistory
+
+DAY = 86400
+
+# Between two refreshes, so no row sits on the cutoff
+KEEP_DAYS = 95
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--cards', type=int, default=2_000, help='Cards in the synthetic catalog')
+    ap.add_argument('--refreshes', type=int, default=20, help='Catalog refreshes, one every 10 days')
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    players = make_catalog(args.cards)['players']
+    now = time.time()
+    start = now - args.refreshes * 10 * DAY
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = CardHistory(os.path.join(tmp, 'card_history.db'))
+        began = time.perf_counter()
+        history.record(players, start)
+        for step in range(1, args.refreshes + 1):
+            # A tenth of the cards get a stat or overall change each refresh
+            for card in rng.sample(players, len(players) // 10):
+                card[rng.choice(STATS + ['overall'])] = rng.randint(40, 99)
+            history.record(players, start + step * 10 * DAY)
+        recorded = time.perf_counter() - began
+        rows_before = history.stats()['rows']
+
+        sample = players[::max(1, len(players) // 200)]
+        cutoff = now - KEEP_DAYS * DAY
+        before = {card['unique_id']: (history.state_as_of(card, now),
+                                      [c for c in history.field_history(card, 'overall') if c[0] >= cutoff])
+                  for card in sample}
+
+        began = time.perf_counter()
+        removed = history.compact(keep_days=KEEP_DAYS)
+        compacted = time.perf_counter() - began
+
+        for card in sample:
+            state, changes = before[card['unique_id']]
+            if state != card or history.state_as_of(card, now) != card:
+                print(f"{card['unique_id']}: current state differs after compact()")
+                sys.exit(1)
+            after = [c for c in history.field_history(card, 'overall') if c[0] >= cutoff]
+            if after != changes:
+                print(f"{card['unique_id']}: overall changes after the cutoff differ after compact()")
+                sys.exit(1)
+
+        print(f"{args.cards} cards x {args.refreshes} refreshes: recorded {rows_before} rows in {recorded:.2f} s")
+        print(f"compact(keep_days={KEEP_DAYS}) folded away {removed} rows in {compacted:.2f} s; "
+              f"{len(sample)} cards query the same before and after")
+
+
+if __name__ == '__main__':
+    main()
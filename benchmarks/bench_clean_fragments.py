@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+utils_clean fragment fast path benchmark
+Vertaa merkkijonopohjaista pikapolkua BeautifulSoupiin ja mittaa 10k rivin siivouksen
+
+Usage: python -m benchmarks.bench_clean_fragments [--rows N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+import utils_clean
+from utils_clean import clean_common_fields, clean_rows, clean_rows_parallel, extract_img_src, extract_text
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATATABLES = [
+    os.path.join(BENCH_DIR, 'corpus', 'v1', 'datatables', 'skaters_page.json'),
+    os.path.join(BENCH_DIR, 'corpus', 'v1', 'datatables', 'goalies_page.json'),
+]
+
+# Shapes the fast path must either handle identically or hand over to BeautifulSoup
+EDGE_CASES = [
+    '', '   ', 'PLAIN', ' padded ', '228&nbsp;lb', 'AT&T', 'x&amp', 'a &foo; b', '&#65;&#x42;', '&#150;',
+    'a<b', 'a < b', '<a title="x>y">T</a>', '<!-- c -->t', '<script>x</script>y', '<p>a</p> <p>b</p>',
+    '<img src="a.jpg"><img src="b.jpg">', '<IMG SRC="a&amp;b.jpg">', '<img src=a.jpg>', '<img src>',
+    '<img src="a.jpg" src="b.jpg">', '<img src="a.jpg"/>', "<a id='12' href='?id=12'>N</a>",
+    '<a href="player-stats.php?id=99">NAME &amp; CO</a>', '<span><b>A</b> B</span>', '<br>C',
+]
+
+
+def soup_text(html):
+    return BeautifulSoup(html, 'html.parser').get_text(strip=True)
+
+
+def soup_img_src(html):
+    img = BeautifulSoup(html, 'html.parser').find('img')
+    return img['src'] if img and img.get('src') else ''
+
+
+def load_rows():
+    rows = []
+    for path in DATATABLES:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows.extend(json.load(f).get('data') or [])
+    return rows
+
+
+def check_parity(rows) -> bool:
+    fragments = set(EDGE_CASES)
+    for row in rows:
+        fragments.update(v for v in row.values() if isinstance(v, str))
+    ok = True
+    for html in sorted(fragments):
+        if extract_text(html) != soup_text(html):
+            print(f"extract_text mismatch for {html!r}: {extract_text(html)!r} != {soup_text(html)!r}")
+            ok = False
+        if extract_img_src(html) != soup_img_src(html):
+            print(f"extract_img_src mismatch for {html!r}: {extract_img_src(html)!r} != {soup_img_src(html)!r}")
+            ok = False
+    fast = sum(1 for html in fragments if utils_clean._split_fragment(html) is not None)
+    print(f"Parity checked on {len(fragments)} fragments ({fast} via fast path)")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, default=10_000, help='Rows to clean per run')
+    ap.add_argument('--workers', type=int, default=0, help='Processes for clean_rows_parallel (0 = all cores)')
+    args = ap.parse_args()
+
+    rows = load_rows()
+    if not check_parity(rows):
+        print("Parity check FAILED")
+        sys.exit(1)
+
+    batch = (rows * (args.rows // len(rows) + 1))[:args.rows]
+    if clean_rows(batch) != [clean_common_fields(r) for r in batch]:
+        print("clean_rows output differs from clean_common_fields")
+        sys.exit(1)
+    if clean_rows_parallel(batch, workers=args.workers) != clean_rows(batch):
+        print("clean_rows_parallel output differs from clean_rows")
+        sys.exit(1)
+    for name, fn in (('clean_common_fields', lambda: [clean_common_fields(r) for r in batch]),
+                     ('clean_rows', lambda: clean_rows(batch)),
+                     ('clean_rows_parallel', lambda: clean_rows_parallel(batch, workers=args.workers))):
+        best = min(timeit.repeat(fn, number=1, repeat=3))
+        print(f"{name:20s} {args.rows} rows in {best:.3f} s ({args.rows / best:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Listing parser micro-benchmark
+Vertaa regex-pikapolkua BeautifulSoup-jäsentimeen hv71.txt listaussivulla
+
+Usage: python -m benchmarks.bench_listing_parser [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import utils_parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LISTING_PAGE = os.path.join(ROOT, 'hv71.txt')
+
+
+def check_parity(html: str) -> bool:
+    """Fast path and tree parser must agree on the captured listing page"""
+    fast_urls = utils_parse._card_urls_fast(html, utils_parse.BASE_URL)
+    soup_urls = utils_parse._card_urls_soup(html, utils_parse.BASE_URL)
+    fast_text = utils_parse._entry_count_text_fast(html)
+    soup_text = utils_parse._entry_count_text_soup(html)
+
+    ok = True
+    if not fast_urls or fast_urls != soup_urls:
+        print(f"URL mismatch:\n  fast: {fast_urls}\n  soup: {soup_urls}")
+        ok = False
+    if not fast_text or fast_text != soup_text:
+        print(f"entry_count mismatch:\n  fast: {fast_text!r}\n  soup: {soup_text!r}")
+        ok = False
+    # Public entry points fall back to the tree parser on pages without containers
+    if utils_parse.extract_card_urls('<div id="other_card_list"></div>') != []:
+        print("Fallback returned URLs for an empty listing")
+        ok = False
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--repeat', type=int, default=50, help='Iterations per parser')
+    args = ap.parse_args()
+
+    with open(LISTING_PAGE, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    if not check_parity(html):
+        print("Parity check FAILED")
+        sys.exit(1)
+    print(f"Parity OK ({len(utils_parse.extract_card_urls(html))} URLs, "
+          f"entry_count '{utils_parse.extract_entry_count_text(html)}')")
+
+    cases = [
+        ('card urls (regex)', lambda: utils_parse._card_urls_fast(html, utils_parse.BASE_URL)),
+        ('card urls (soup)', lambda: utils_parse._card_urls_soup(html, utils_parse.BASE_URL)),
+        ('entry_count (regex)', lambda: utils_parse._entry_count_text_fast(html)),
+        ('entry_count (soup)', lambda: utils_parse._entry_count_text_soup(html)),
+    ]
+    timings = {}
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.repeat, repeat=3)) / args.repeat
+        timings[name] = best
+        print(f"{name:22s} {best * 1000:9.3f} ms/page")
+
+    print(f"Speedup card urls:   {timings['card urls (soup)'] / timings['card urls (regex)']:.0f}x")
+    print(f"Speedup entry_count: {timings['entry_count (soup)'] / timings['entry_count (regex)']:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+master.json vs binary snapshot vs lazy catalog load benchmark
+Vertaa sisennetyn master.json:n jäsentämistä master.snap-latauksen ja LazyCatalogin
+(vain yhteenvetotaulu muistissa) nopeuteen ja muistinkäyttöön
+
+Usage: python -m benchmarks.bench_master_snapshot [--cards N]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from utils_lazy_catalog import LazyCatalog, build_lazy_catalog
+from utils_snapshot import load_master_json, read_snapshot, snapshot_path, write_snapshot
+
+TEAMS = ['Anaheim Ducks', 'Boston Bruins', 'Buffalo Sabres', 'Calgary Flames', 'Carolina Hurricanes',
+         'Chicago Blackhawks', 'Colorado Avalanche', 'Dallas Stars', 'Detroit Red Wings', 'Edmonton Oilers',
+         'Florida Panthers', 'Los Angeles Kings', 'Montreal Canadiens', 'New York Rangers', 'Tappara', 'HIFK']
+NATIONS = ['Canada', 'USA', 'Sweden', 'Finland', 'Russia', 'Czechia', 'Slovakia', 'Germany', 'Switzerland', 'Denmark']
+CARDS = ['Base', 'Marquee', 'TOTW', 'Team of the Year', 'Ultimate Icons', 'Legends', 'Master Set']
+STATS = ['acceleration', 'agility', 'balance', 'endurance', 'speed', 'slap_shot_accuracy', 'slap_shot_power',
+         'wrist_shot_accuracy', 'wrist_shot_power', 'deking', 'off_awareness', 'hand_eye', 'passing',
+         'puck_control', 'body_checking', 'strength', 'aggression', 'durability', 'fighting_skill',
+         'def_awareness', 'shot_blocking', 'stick_checking', 'faceoffs', 'discipline']
+
+
+def make_catalog(count: int) -> dict:
+    """Synthetic fully-statted catalog shaped like master.json cards"""
+    rng = random.Random(42)
+    players = []
+    for i in range(count):
+        card = {
+            'url': f'https://nhlhutbuilder.com/player-stats.php?id={i}',
+            'player_id': i,
+            'unique_id': f'{i}_skater',
+            'is_goalie': False,
+            'name': f'PLAYER {i}',
+            'full_name': f'PLAYER {i}',
+            'image_url': f'https://nhlhutbuilder.com/images/card_art/players/{i}.jpg',
+            'overall': rng.randint(70, 99),
+            'card': rng.choice(CARDS),
+            'nationality': rng.choice(NATIONS),
+            'league': 'NHL',
+            'team': rng.choice(TEAMS),
+            'position': rng.choice(['C', 'LW', 'RW', 'LD', 'RD']),
+            'hand': rng.choice(['LEFT', 'RIGHT']),
+            'salary': rng.randint(750, 12000) * 1000,
+            'height': rng.randint(170, 205),
+            'weight': rng.randint(75, 110),
+            'date_added': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'date_updated': f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'xfactors': [{'name': rng.choice(['SNIPE', 'ONE TEE', 'TRUCULENCE']), 'tier': 'Zone'}],
+        }
+        card.update({stat: rng.randint(40, 99) for stat in STATS})
+        players.append(card)
+    return {'players': players}
+
+
+def json_load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def resident_bytes(fn) -> int:
+    """Bytes still allocated by the object fn() returns"""
+    gc.collect()
+    tracemalloc.start()
+    data = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--cards', type=int, default=30_000, help='Cards in the synthetic catalog')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'master.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(make_catalog(args.cards), f, indent=2, ensure_ascii=False)
+        write_snapshot(json_load(path), path)
+        if read_snapshot(path) != json_load(path) or load_master_json(path) != json_load(path):
+            print("Snapshot content differs from master.json")
+            sys.exit(1)
+
+        build_lazy_catalog(path)
+        with LazyCatalog(path) as catalog:
+            if any(catalog.record(row) != card for row, card in enumerate(json_load(path)['players'])):
+                print("LazyCatalog records differ from master.json")
+                sys.exit(1)
+
+        json_size = os.path.getsize(path)
+        snap_size = os.path.getsize(snapshot_path(path))
+        print(f"{args.cards} cards: master.json {json_size / 1e6:.1f} MB, master.snap {snap_size / 1e6:.1f} MB")
+        for name, fn in (('json.load', lambda: json_load(path)),
+                         ('read_snapshot', lambda: read_snapshot(path)),
+                         ('LazyCatalog', lambda: LazyCatalog(path))):
+            best = min(timeit.repeat(fn, number=1, repeat=5))
+            print(f"{name:14s} load {best * 1000:7.1f} ms, resident {resident_bytes(fn) / 1e6:6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Parser corpus benchmark
+Ajaa jäsentimet versioitua korpusta vastaan, vertaa tuloksia golden-tiedostoihin
+ja raportoi läpäisykyvyn (pages/sec, rows/sec)
+
+Usage:
+    python -m benchmarks.run_parser_benchmarks                  # check golden + throughput
+    python -m benchmarks.run_parser_benchmarks --save-baseline  # record throughput on this machine
+    python -m benchmarks.run_parser_benchmarks --update-golden  # accept current parser output
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+from nhl_card_monitor_auto import NHLCardMonitorAuto
+from utils_clean import clean_common_fields, clean_rows
+from utils_parse import extract_card_urls, extract_entry_count_text
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, 'corpus', 'v1')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'parser_baseline.json')
+
+
+class _ExtractorHost:
+    """Minimal stand-in for the monitor so its extractor methods run without a GUI"""
+    logger = logging.getLogger('parser_bench')
+    extract_player_stats = NHLCardMonitorAuto.extract_player_stats
+    extract_xfactors = NHLCardMonitorAuto.extract_xfactors
+
+
+_host = _ExtractorHost()
+
+
+def parse_player_stats(entry: Dict, text: str):
+    soup = BeautifulSoup(text, 'html.parser')
+    card_data = dict(entry['seed'])
+    _host.extract_player_stats(soup, card_data, card_data['is_goalie'])
+    return card_data
+
+
+def parse_xfactors(entry: Dict, text: str):
+    soup = BeautifulSoup(text, 'html.parser')
+    card_data = {}
+    _host.extract_xfactors(soup, card_data)
+    return card_data.get('xfactors', [])
+
+
+def parse_listing(entry: Dict, text: str):
+    return {
+        'urls': extract_card_urls(text),
+        'entry_count': extract_entry_count_text(text),
+    }
+
+
+def parse_datatables(entry: Dict, text: str):
+    rows = json.loads(text).get('data') or []
+    return [clean_common_fields(r) for r in rows]
+
+
+def parse_datatables_batch(entry: Dict, text: str):
+    return clean_rows(json.loads(text).get('data') or [])
+
+
+# name -> (corpus sections, throughput unit, parse function)
+PARSERS: Dict[str, tuple] = {
+    'extract_player_stats': (['skater', 'goalie'], 'pages', parse_player_stats),
+    'extract_xfactors': (['skater', 'goalie'], 'pages', parse_xfactors),
+    'listing': (['listing'], 'pages', parse_listing),
+    'clean_common_fields': (['datatables'], 'rows', parse_datatables),
+    'clean_rows': (['datatables'], 'rows', parse_datatables_batch),
+}
+
+# Parsers that must reproduce another parser's golden output
+GOLDEN_ALIASES = {
+    'clean_rows': 'clean_common_fields',
+}
+
+
+def load_corpus(corpus_dir: str) -> Dict[str, List[tuple]]:
+    """Read manifest and every corpus file into memory: section -> [(entry, text)]"""
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    corpus = {}
+    for section, entries in manifest.items():
+        if not isinstance(entries, list):
+            continue
+        corpus[section] = []
+        for entry in entries:
+            with open(os.path.join(corpus_dir, entry['file']), 'r', encoding='utf-8') as f:
+                corpus[section].append((entry, f.read()))
+    return corpus
+
+
+def count_units(unit: str, outputs: List) -> int:
+    if unit == 'rows':
+        return sum(len(o) for o in outputs)
+    return len(outputs)
+
+
+def measure(fn: Callable, inputs: List[tuple], unit: str, min_time: float) -> float:
+    """Run fn over all inputs until min_time has elapsed, return units per second"""
+    units = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        outputs = [fn(entry, text) for entry, text in inputs]
+        units += count_units(unit, outputs)
+        elapsed = time.perf_counter() - start
+    return units / elapsed
+
+
+def check_golden(name: str, fn: Callable, inputs: List[tuple], golden_dir: str, update: bool) -> bool:
+    """Compare parser output against golden/<name>.json (or rewrite it)"""
+    actual = {entry['file']: fn(entry, text) for entry, text in inputs}
+    # Round-trip through JSON so tuples/ints compare the same way as on disk
+    actual = json.loads(json.dumps(actual, ensure_ascii=False))
+    path = os.path.join(golden_dir, f'{GOLDEN_ALIASES.get(name, name)}.json')
+    if update:
+        if name in GOLDEN_ALIASES:
+            return True
+        os.makedirs(golden_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(actual, f, ensure_ascii=False, indent=2, sort_keys=True)
+        return True
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+    except FileNotFoundError:
+        print(f"  ❌ {name}: golden file missing ({path}), run with --update-golden")
+        return False
+    ok = True
+    for file_name in sorted(set(expected) | set(actual)):
+        if expected.get(file_name) != actual.get(file_name):
+            print(f"  ❌ {name}: output differs for {file_name}")
+            ok = False
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--corpus', default=DEFAULT_CORPUS, help='Corpus directory containing manifest.json')
+    ap.add_argument('--baseline', default=DEFAULT_BASELINE, help='Throughput baseline JSON')
+    ap.add_argument('--threshold', type=float, default=0.25,
+                    help='Allowed throughput drop vs baseline (0.25 = 25%%)')
+    ap.add_argument('--min-time', type=float, default=1.0, help='Seconds to spend per parser')
+    ap.add_argument('--only', choices=sorted(PARSERS), action='append', help='Run only these parsers')
+    ap.add_argument('--save-baseline', action='store_true', help='Write measured throughput as the new baseline')
+    ap.add_argument('--update-golden', action='store_true', help='Rewrite golden outputs from current parsers')
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    golden_dir = os.path.join(args.corpus, 'golden')
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    failed = False
+    results = {}
+    print(f"{'parser':24s} {'throughput':>16s} {'baseline':>12s} {'change':>8s}")
+    for name, (sections, unit, fn) in PARSERS.items():
+        if args.only and name not in args.only:
+            continue
+        inputs = [item for section in sections for item in corpus.get(section, [])]
+        if not inputs:
+            print(f"{name:24s} (no corpus entries)")
+            continue
+
+        if not check_golden(name, fn, inputs, golden_dir, args.update_golden):
+            failed = True
+
+        rate = measure(fn, inputs, unit, args.min_time)
+        results[name] = {'unit': unit, 'per_sec': round(rate, 1)}
+
+        base = baseline.get(name, {}).get('per_sec')
+        if base:
+            change = (rate - base) / base
+            marker = ''
+            if change < -args.threshold:
+                marker = '  ❌ REGRESSION'
+                failed = True
+            print(f"{name:24s} {rate:9.1f} {unit}/s {base:12.1f} {change:+7.1%}{marker}")
+        else:
+            print(f"{name:24s} {rate:9.1f} {unit}/s {'-':>12s} {'-':>8s}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"💾 Baseline saved to {args.baseline}")
+    elif not baseline:
+        print("ℹ️  No baseline yet, run with --save-baseline to enable regression checks")
+
+    if args.update_golden:
+        print(f"💾 Golden outputs written to {golden_dir}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -31,6 +31,18 @@ a = Analysis(
         ('update_missing_cards_final.py', '.'),
         ('enrich_country_xfactors.py', '.'),
         ('utils_clean.py', '.'),
+        ('utils_parse.py', '.'),
+        ('utils_fetch.py', '.'),
+        ('utils_xfactor_cache.py', '.'),
+        ('utils_backup.py', '.'),
+        ('utils_card_store.py', '.'),
+        ('utils_merge.py', '.'),
+        ('utils_changelog.py', '.'),
+        ('utils_master_cache.py', '.'),
+        ('utils_snapshot.py', '.'),
+        ('utils_writer_lock.py', '.'),
+        ('utils_card_history.py', '.'),
+        ('utils_drift.py', '.'),
     ],
     hiddenimports=[
         'requests',
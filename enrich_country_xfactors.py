@@ -4,13 +4,21 @@ Country X-Factor Enricher
 Enriches any country's players with X-Factor abilities
 """
 
-import requests
+import argparse
 import json
-import time
+import os
+import requests
 from bs4 import BeautifulSoup
+from utils_fetch import SHARED_LIMITER, make_session, ordered_map
+from utils_xfactor_cache import XFactorCache
+
+# Flush <country>.json and the progress file after this many players fetched from the network
+CHECKPOINT_EVERY = 25
 
-def fetch_xfactors_with_tiers(player_id, timeout=10, is_goalie=False):
-    """Fetch X-Factor abilities for a player with timeout protection"""
+GOALIE_ONLY_FIELDS = ['glove_high', 'glove_low', 'stick_high', 'stick_low', 'shot_recovery', 'positioning', 'breakaway', 'vision', 'poke_check', 'rebound_control']
+
+def fetch_xfactors_with_tiers(player_id, timeout=10, is_goalie=False, session=None):
+    """Fetch X-Factor abilities for a player with timeout protection; None if the fetch failed"""
     try:
         if is_goalie:
             url = f"https://nhlhutbuilder.com/goalie-stats.php?id={player_id}"
@@ -25,10 +33,11 @@ def fetch_xfactors_with_tiers(player_id, timeout=10, is_goalie=False):
             'Connection': 'keep-alive',
         }
         
-        resp = requests.get(url, headers=headers, timeout=timeout)
+        resp = (session or requests).get(url, headers=headers, timeout=timeout)
         
         if resp.status_code != 200:
-            return []
+            # Failed, not empty: callers must not cache this as "no X-Factors"
+            return None
         
         soup = BeautifulSoup(resp.text, 'html.parser')
         
@@ -80,82 +89,176 @@ def fetch_xfactors_with_tiers(player_id, timeout=10, is_goalie=False):
         
     except Exception as e:
         print(f"   ❌ Error fetching X-Factors for {player_id}: {e}")
-        return []
+        return None
 
-def enrich_country_xfactors(country):
-    """Enrich country players with X-Factor data"""
-    print(f"🏒 {country.upper()} X-FACTOR ENRICHER")
+def _is_goalie(player):
+    """Goalie by position or by goalie-only stat fields"""
+    return player.get('position', '') == 'G' or any(field in player for field in GOALIE_ONLY_FIELDS)
+
+def _player_key(player):
+    # Skater and goalie ids come from different tables and can collide
+    return f"{'G' if _is_goalie(player) else 'S'}{player.get('player_id')}"
+
+def _atomic_dump(path, data, indent=2):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _country_path(country):
+    # Either a country name (-> <country>.json) or a path such as catalog/nationality/finland.json
+    return country if country.lower().endswith('.json') else f'{country.lower()}.json'
+
+class _CountryJob:
+    """One country file being enriched, with its checkpoint state"""
+
+    def __init__(self, country):
+        self.country = country
+        self.path = _country_path(country)
+        self.progress_path = f'{self.path}.xfactors-progress.json'
+        self.players = []
+        self.todo = []
+        self.done = set()
+        self.pending = 0
+        self.enriched_count = 0
+        self.since_flush = 0
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.players = json.load(f)
+        except FileNotFoundError:
+            print(f"❌ {self.path} not found! Run universal_country_fetcher.py first.")
+            return False
+        # Resume: players handled before a crash are listed in the progress file
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                self.done = set(json.load(f).get('done', []))
+            print(f"↩️  {self.country}: resuming, {len(self.done)} players already processed")
+        print(f"📊 {self.country}: loaded {len(self.players)} players")
+
+        # Check which players need X-Factor data
+        for i, player in enumerate(self.players):
+            if player.get('xfactors') or _player_key(player) in self.done:
+                continue
+            if not player.get('player_id'):
+                print(f"   ⚠️  {self.country}: player {i+1} has no player_id, skipping")
+                continue
+            self.todo.append(player)
+        self.pending = len(self.todo)
+        print(f"🎯 {self.country}: {len(self.todo)} players need X-Factor data")
+        return True
+
+    def record(self, player, xfactors, fetched=True):
+        self.pending -= 1
+        if xfactors is not None:
+            player['xfactors'] = xfactors
+            self.done.add(_player_key(player))
+            # Only network fetches count toward a checkpoint; cache hits are cheap to redo
+            if fetched:
+                self.since_flush += 1
+        # A failed fetch (None) is not marked done, so the next run tries the player again
+        if xfactors:
+            self.enriched_count += 1
+        if self.pending == 0:
+            self.finish()
+        elif self.since_flush >= CHECKPOINT_EVERY:
+            self.flush()
+
+    def flush(self):
+        # Country file first, then progress: a crash in between only repeats a few fetches
+        _atomic_dump(self.path, self.players)
+        _atomic_dump(self.progress_path, {'done': sorted(self.done)}, indent=None)
+        self.since_flush = 0
+
+    def finish(self):
+        print(f"\n💾 {self.country}: SAVING ENRICHED DATA...")
+        _atomic_dump(self.path, self.players)
+        if os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+        print(f"✅ {self.country}: enriched {self.enriched_count} players with X-Factor data")
+
+    def summary(self):
+        players_with_xfactors = len([p for p in self.players if p.get('xfactors')])
+        print(f"\n📊 {self.country.upper()} FINAL SUMMARY:")
+        print(f"   • Total players: {len(self.players)}")
+        print(f"   • Players with X-Factors: {players_with_xfactors}")
+        print(f"   • Players without X-Factors: {len(self.players) - players_with_xfactors}")
+
+def enrich_countries(countries, workers=4, timeout=10, cache=None):
+    """Enrich several country files in one run.
+
+    Players found in the X-Factor cache (xfactor_cache.json) are filled in locally; the
+    rest share one connection pool and the process-wide request budget
+    (utils_fetch.SHARED_LIMITER) and are fetched by `workers` threads. Each file is
+    rewritten atomically every CHECKPOINT_EVERY fetched players and a rerun resumes from there.
+    """
+    cache = cache or XFactorCache()
+    print(f"🏒 {', '.join(c.upper() for c in countries)} X-FACTOR ENRICHER")
     print("=" * 50)
-    
-    # Load existing data
-    try:
-        with open(f'{country.lower()}.json', 'r', encoding='utf-8') as f:
-            players = json.load(f)
-    except FileNotFoundError:
-        print(f"❌ {country.lower()}.json not found! Run universal_country_fetcher.py first.")
-        return
-    
-    print(f"📊 Loaded {len(players)} players")
-    
-    # Check which players need X-Factor data
-    players_without_xfactors = []
-    for player in players:
-        if 'xfactors' not in player or not player['xfactors']:
-            players_without_xfactors.append(player)
-    
-    print(f"🎯 {len(players_without_xfactors)} players need X-Factor data")
-    
-    if not players_without_xfactors:
+
+    jobs = [job for job in (_CountryJob(c) for c in countries) if job.load()]
+    for job in jobs:
+        if not job.todo and os.path.exists(job.progress_path):
+            # Crashed after the last fetch but before the final save
+            job.finish()
+    work = [(job, player) for job in jobs for player in job.todo]
+    if not work:
         print("✅ All players already have X-Factor data!")
-        return
-    
-    # Enrich players with X-Factor data
-    enriched_count = 0
-    for i, player in enumerate(players_without_xfactors):
-        player_id = player.get('player_id')
-        if not player_id:
-            print(f"   ⚠️  Player {i+1} has no player_id, skipping")
-            continue
-        
-        print(f"   🔄 Processing player {i+1}/{len(players_without_xfactors)}: {player.get('full_name', 'Unknown')} (ID: {player_id})")
-        
-        # Check if this is a goalie by position or specific goalie-only fields
-        position = player.get('position', '')
-        goalie_only_fields = ['glove_high', 'glove_low', 'stick_high', 'stick_low', 'shot_recovery', 'positioning', 'breakaway', 'vision', 'poke_check', 'rebound_control']
-        is_goalie = position == 'G' or any(field in player for field in goalie_only_fields)
-        
-        xfactors = fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie)
-        player['xfactors'] = xfactors
-        
-        if xfactors:
-            print(f"      ✅ Found {len(xfactors)} X-Factors")
-            enriched_count += 1
+        return jobs
+
+    # Local lookups first; only cache misses go to the network
+    misses = []
+    for job, player in work:
+        xfactors = cache.get(player['player_id'], _is_goalie(player))
+        if xfactors is None:
+            misses.append((job, player))
         else:
-            print(f"      ⚠️  No X-Factors found")
-        
-        # Small delay to be nice to the server
-        time.sleep(0.3)
-    
-    # Save enriched data
-    print(f"\n💾 SAVING ENRICHED DATA...")
-    with open(f'{country.lower()}.json', 'w', encoding='utf-8') as f:
-        json.dump(players, f, indent=2, ensure_ascii=False)
-    
-    print(f"✅ Enriched {enriched_count} players with X-Factor data")
-    
-    # Final summary
-    players_with_xfactors = len([p for p in players if p.get('xfactors')])
-    print(f"\n📊 FINAL SUMMARY:")
-    print(f"   • Total players: {len(players)}")
-    print(f"   • Players with X-Factors: {players_with_xfactors}")
-    print(f"   • Players without X-Factors: {len(players) - players_with_xfactors}")
+            job.record(player, xfactors, fetched=False)
+    print(f"💾 {len(work) - len(misses)} players from X-Factor cache, {len(misses)} to fetch")
+
+    session = make_session(workers)
+
+    def fetch(item):
+        job, player = item
+        is_goalie = _is_goalie(player)
+        SHARED_LIMITER.wait()
+        xfactors = fetch_xfactors_with_tiers(player['player_id'], timeout=timeout, is_goalie=is_goalie, session=session)
+        cache.put(player['player_id'], is_goalie, xfactors)
+        return xfactors
+
+    try:
+        for i, ((job, player), xfactors) in enumerate(zip(misses, ordered_map(fetch, misses, workers=workers))):
+            if xfactors is None:
+                status = "❌ Fetch failed, retried on the next run"
+            else:
+                status = f"✅ {len(xfactors)} X-Factors" if xfactors else "⚠️  No X-Factors found"
+            print(f"   🔄 {i+1}/{len(misses)} {job.country}: {player.get('full_name', 'Unknown')} (ID: {player['player_id']}) {status}")
+            job.record(player, xfactors)
+            if (i + 1) % CHECKPOINT_EVERY == 0:
+                cache.save()
+    finally:
+        # Keep whatever finished before an interrupt
+        for job in jobs:
+            if job.pending and job.since_flush:
+                job.flush()
+        cache.save()
+        session.close()
+
+    for job in jobs:
+        job.summary()
+    return jobs
+
+def enrich_country_xfactors(country, workers=4):
+    """Enrich country players with X-Factor data"""
+    return enrich_countries([country], workers=workers)
+
+def main():
+    ap = argparse.ArgumentParser(description='Enrich country player files with X-Factor abilities')
+    ap.add_argument('countries', nargs='+', help='Country names (e.g., Denmark Finland) or JSON file paths')
+    ap.add_argument('--workers', type=int, default=4, help='Parallel player page requests (default: 4)')
+    args = ap.parse_args()
+    enrich_countries(args.countries, workers=args.workers)
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 2:
-        print("Usage: python3 enrich_country_xfactors.py <country_name>")
-        print("Example: python3 enrich_country_xfactors.py Denmark")
-        sys.exit(1)
-    
-    country = sys.argv[1]
-    enrich_country_xfactors(country)
\ No newline at end of file
+    main()
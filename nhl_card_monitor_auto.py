@@ -8,7 +8,6 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
 import time
-import json
 import requests
 from bs4 import BeautifulSoup
 import logging
@@ -19,6 +18,11 @@ import re
 from typing import List, Dict, Optional, Set
 from urllib.parse import urlparse, parse_qs
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils_parse import extract_card_urls, extract_entry_count_text
+from utils_drift import FieldCoverage, preflight_check, COVERAGE_WARN_RATIO
+from utils_changelog import MasterChangeLog
+from utils_merge import merge_cards
+from utils_master_cache import shared_cache
 
 class NHLCardMonitorAuto:
     def __init__(self, root):
@@ -34,6 +38,12 @@ class NHLCardMonitorAuto:
         self.master_data = None
         self.master_urls = set()
         self.new_cards_data = []
+        self.coverage = FieldCoverage()
+        # New cards go to an append-only log on top of master.json, like every other writer;
+        # master.db, if used, is synced from master.json by its readers
+        self.change_log = MasterChangeLog('master.json')
+        # Parsed master.json + log, re-read only when another process changes the files
+        self.master_cache = shared_cache('master.json')
         
         # Configuration
         self.find_cards_url = "https://nhlhutbuilder.com/php/find_cards.php"
@@ -43,6 +53,7 @@ class NHLCardMonitorAuto:
         self.page_delay = 0.5  # Reduced from 1.0 to 0.5 seconds
         self.max_pages = 10
         self.limit_per_page = 40
+        self.coverage_report_every = 10  # Log field coverage every N parsed cards
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36',
@@ -182,15 +193,12 @@ class NHLCardMonitorAuto:
             return True  # If we can't check, assume there are new cards
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Find entry_count element
-            entry_count_div = soup.find('div', id='entry_count')
-            if not entry_count_div:
+            entry_text = extract_entry_count_text(response.text)
+            if entry_text is None:
                 self.log_message("Ei loytynyt entry_count elementtia", "WARNING")
                 return True  # If not found, continue search
             
-            entry_text = entry_count_div.get_text().strip()
             self.log_message(f"Entry count teksti: '{entry_text}'", "INFO")
             
             # Parse total count (e.g. "Showing 1 to 40 of 2536 entries")
@@ -204,9 +212,7 @@ class NHLCardMonitorAuto:
             
             # Load master.json and compare
             try:
-                with open('master.json', 'r', encoding='utf-8') as f:
-                    master_data = json.load(f)
-                master_count = len(master_data['players'])
+                master_count = self.master_cache.count()
                 self.log_message(f"Master.json maara: {master_count} pelaajaa", "INFO")
                 
                 if total_entries == master_count:
@@ -250,21 +256,8 @@ class NHLCardMonitorAuto:
             return []
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find other_card_container divs
-            card_containers = soup.find_all('div', class_='other_card_container')
-            
             # Collect URLs
-            urls = []
-            for container in card_containers:
-                # Find a element
-                link = container.find('a', href=True)
-                if link:
-                    href = link.get('href')
-                    if href:
-                        full_url = f'https://nhlhutbuilder.com/{href}'
-                        urls.append(full_url)
+            urls = extract_card_urls(response.text)
             
             self.log_message(f"Loydetiin {len(urls)} URLia sivulta {page_number}", "SUCCESS")
             return urls
@@ -278,8 +271,7 @@ class NHLCardMonitorAuto:
         try:
             self.update_status("Ladataan master.json...")
             self.log_message("Ladataan master.json...", "INFO")
-            with open('master.json', 'r', encoding='utf-8') as f:
-                self.master_data = json.load(f)
+            self.master_data = self.master_cache.get()
             players = self.master_data.get('players', [])
             self.master_urls = set()
             for player in players:
@@ -305,10 +297,22 @@ class NHLCardMonitorAuto:
         
         return missing_urls, found_urls
             
+    def run_preflight_check(self) -> bool:
+        """Parse canary pages before a crawl; False means the page layout has drifted"""
+        self.log_message("Tarkistetaan sivurakenne kanarian korttisivuilla...", "INFO")
+        failures = preflight_check(self.fetch_card_details)
+        if failures:
+            for url, fields in failures.items():
+                self.log_message(f"Kanaria epaonnistui {url}: puuttuu {', '.join(fields)}", "ERROR")
+            return False
+        self.log_message("Sivurakenne OK", "SUCCESS")
+        return True
+    
     def fetch_new_cards_data(self, missing_urls):
         """Fetch detailed data for new cards with concurrent processing"""
         self.log_message("Haetaan yksityiskohtaisia korttitietoja...", "INFO")
         self.new_cards_data = []
+        self.coverage = FieldCoverage()
         
         # Use ThreadPoolExecutor for concurrent fetching
         with ThreadPoolExecutor(max_workers=5) as executor:
@@ -324,12 +328,25 @@ class NHLCardMonitorAuto:
                     if card_data:
                         self.new_cards_data.append(card_data)
                         self.log_message(f"Haettu: {card_data.get('name', 'Tuntematon')}", "SUCCESS")
+                        self.coverage.add(card_data)
+                        if self.coverage.total % self.coverage_report_every == 0:
+                            self.log_coverage()
                     else:
                         self.log_message(f"Ei voitu hakea korttia: {url}", "ERROR")
                 except Exception as e:
                     self.log_message(f"Virhe kortin hakemisessa {url}: {e}", "ERROR")
                 
         self.log_message(f"Haettu {len(self.new_cards_data)} korttia yksityiskohtaisilla tiedoilla", "SUCCESS")
+        self.log_coverage()
+        
+    def log_coverage(self):
+        """Log per-field extraction coverage of the current crawl"""
+        if not self.coverage.total:
+            return
+        self.log_message(f"Kenttien kattavuus: {self.coverage.summary()}", "INFO")
+        low_fields = self.coverage.low_fields()
+        if low_fields:
+            self.log_message(f"Kattavuus alle {COVERAGE_WARN_RATIO:.0%}: {', '.join(low_fields)} - sivun rakenne voi olla muuttunut", "WARNING")
                 
     def fetch_card_details(self, url):
         """Fetch detailed card information from URL"""
@@ -857,79 +874,54 @@ class NHLCardMonitorAuto:
             
         self.log_message("Lisataan uudet kortit master.json:iin...", "JSON")
         
-        # Add new cards to master data
-        added_count = 0
-        skipped_count = 0
-        
-        for card in self.new_cards_data:
-            # Check if player already exists (by unique_id, player_id+is_goalie, or URL)
-            existing_player = None
-            card_unique_id = card.get('unique_id')
-            card_player_id = card.get('player_id')
-            card_is_goalie = card.get('is_goalie')
-            card_url = card.get('url')
-            
-            for player in self.master_data['players']:
-                # Check by unique_id first
-                if card_unique_id and player.get('unique_id') == card_unique_id:
-                    existing_player = player
-                    break
-                # Check by player_id + is_goalie combination
-                elif (player.get('player_id') == card_player_id and 
-                      player.get('is_goalie') == card_is_goalie):
-                    existing_player = player
-                    break
-                # Check by URL as fallback
-                elif player.get('url') == card_url:
-                    existing_player = player
-                    break
-                    
-            if not existing_player:
-                # Add new player
-                self.master_data['players'].append(card)
-                self.master_urls.add(card.get('url', ''))
-                added_count += 1
-                player_type = "Maalivahti" if card_is_goalie else "Kenttapelaaja"
-                self.log_message(f"Lisatty: {card.get('name', 'Tuntematon')} (ID: {card_player_id}, {player_type})", "JSON")
-            else:
-                skipped_count += 1
-                player_type = "Maalivahti" if card_is_goalie else "Kenttapelaaja"
-                self.log_message(f"Pelaaja jo olemassa: {card.get('name', 'Tuntematon')} (ID: {card_player_id}, {player_type})", "WARNING")
+        # Merge against cards other monitors wrote since our last load (no reparse if none)
+        fresh = self.master_cache.get()
+        if fresh is not self.master_data:
+            self.master_data = fresh
+            self.master_urls = {p['url'] for p in fresh.get('players', []) if p.get('url')}
                 
-        if added_count > 0:
-            # Create backup BEFORE modifying master.json
-            backup_filename = f"master_backup_{int(time.time())}.json"
-            try:
-                # Load original master.json for backup
-                with open('master.json', 'r', encoding='utf-8') as f:
-                    original_data = json.load(f)
-                with open(backup_filename, 'w', encoding='utf-8') as f:
-                    json.dump(original_data, f, indent=2, ensure_ascii=False)
-                self.log_message(f"Varmuuskopio luotu: {backup_filename}", "JSON")
-            except Exception as e:
-                self.log_message(f"Virhe varmuuskopion luomisessa: {e}", "ERROR")
+        # Merge new cards into master data through hash indexes (unique_id, player_id+is_goalie, url)
+        result = merge_cards(self.master_data['players'], self.new_cards_data)
+        for card in result.added:
+            self.master_urls.add(card.get('url', ''))
+            player_type = "Maalivahti" if card.get('is_goalie') else "Kenttapelaaja"
+            self.log_message(f"Lisatty: {card.get('name', 'Tuntematon')} (ID: {card.get('player_id')}, {player_type})", "JSON")
+        for card in result.updated:
+            player_type = "Maalivahti" if card.get('is_goalie') else "Kenttapelaaja"
+            self.log_message(f"Paivitetty: {card.get('name', 'Tuntematon')} (ID: {card.get('player_id')}, {player_type})", "JSON")
+        if result.unchanged:
+            self.log_message(f"Hypatty {len(result.unchanged)} korttia (jo olemassa, ei muutoksia)", "WARNING")
             
-            # Save updated master.json
+        if result.changed:
+            # Append only the added/updated cards to the change log; master.json is rewritten by compaction
             try:
-                with open('master.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.master_data, f, indent=2, ensure_ascii=False)
-                    
-                self.log_message(f"Lisatty {added_count} uutta korttia master.json:iin!", "SUCCESS")
-                if skipped_count > 0:
-                    self.log_message(f"Hypatty {skipped_count} korttia (jo olemassa)", "WARNING")
-                self.log_message(f"Master.json paivitetty: {len(self.master_data['players'])} pelaajaa", "JSON")
-                self.update_status(f"Lisatty {added_count} uutta korttia master.json:iin!")
+                last_seq = self.change_log.append(result.changed)
+                self.master_cache.update(self.master_data)
+                self.log_message(f"Muutosloki {self.change_log.log_path} paivitetty (seq {last_seq}): {result.summary()}", "SUCCESS")
+                self.log_message(f"Master-data: {len(self.master_data['players'])} pelaajaa", "JSON")
+                self.update_status(f"Lisatty {len(result.added)} uutta korttia master.json:iin!")
                 
                 # Clear new cards data
                 self.new_cards_data = []
                 
+                if self.change_log.maybe_compact(self._on_compacted):
+                    self.log_message("Tiivistetaan muutosloki master.json:iin taustalla...", "JSON")
+                
             except Exception as e:
-                self.log_message(f"Virhe master.json:n tallentamisessa: {e}", "ERROR")
+                self.log_message(f"Virhe muutoslokiin kirjoittamisessa: {e}", "ERROR")
+                self.master_cache.invalidate()
                 self.update_status(f"Virhe: {e}")
         else:
             self.log_message("Ei uusia kortteja lisattavaksi!", "WARNING")
             self.update_status("Ei uusia kortteja lisattavaksi!")
             
+    def _on_compacted(self, folded: int, error: Optional[Exception]):
+        """Background compaction finished"""
+        if error:
+            self.log_message(f"Virhe muutoslokin tiivistyksessa: {error}", "ERROR")
+        else:
+            self.log_message(f"Muutosloki tiivistetty: {folded} muutosta master.json:iin", "JSON")
+            
     def start_monitoring(self):
         """Start automatic monitoring"""
         if not self.master_data:
@@ -953,7 +945,12 @@ class NHLCardMonitorAuto:
                 self.log_message("Automaattinen tarkistus aloitettu...", "INFO")
                 
                 # Check for new cards
-                if self.check_total_entries():
+                new_cards_available = self.check_total_entries()
+                if new_cards_available and not self.run_preflight_check():
+                    # Parser no longer matches the site, don't spend the crawl on empty cards
+                    self.log_message("Sivun rakenne on muuttunut! Haku keskeytetty ennen korttien hakua.", "ERROR")
+                    self.update_status("Haku keskeytetty: sivun rakenne muuttunut")
+                elif new_cards_available:
                     self.log_message("Uusia kortteja havaittu! Suoritetaan täysi haku...", "WARNING")
                     
                     # Find missing cards
@@ -21,6 +21,7 @@ from update_missing_cards_final import (
     find_missing_urls, fetch_cards_page, make_request_with_retry, config
 )
 from enrich_country_xfactors import fetch_xfactors_with_tiers
+from utils_xfactor_cache import XFactorCache
 
 class NHLCardMonitorConsole:
     def __init__(self):
@@ -30,6 +31,7 @@ class NHLCardMonitorConsole:
         self.master_data = None
         self.master_urls = set()
         self.new_cards_data = []
+        self.xfactor_cache = XFactorCache()
         
         # Setup logging
         self.setup_logging()
@@ -312,7 +314,12 @@ class NHLCardMonitorConsole:
                 is_goalie = card.get('is_goalie', False)
                 
                 if player_id:
-                    xfactors = fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie)
+                    # Cache hit, or a fetch followed by a pause to be nice to the server
+                    xfactors = self.xfactor_cache.get_or_fetch(
+                        player_id, is_goalie, lambda: fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie), delay=0.5)
+                    if xfactors is None:
+                        self.log_message(f"X-Factor haku epäonnistui {card.get('name', 'Tuntematon')}:lle, yritetään uudelleen seuraavalla kerralla", "WARNING")
+                        continue
                     card['xfactors'] = xfactors
                     
                     if xfactors:
@@ -321,9 +328,8 @@ class NHLCardMonitorConsole:
                     else:
                         self.log_message(f"Ei X-Factor kykyjä {card.get('name', 'Tuntematon')}:lle", "WARNING")
                         
-                time.sleep(0.5)  # Be nice to the server
-                
-        self.log_message(f"X-Factor rikastus valmis! Rikastettu {enriched_count} korttia", "SUCCESS")
+        self.xfactor_cache.save()
+        self.log_message(f"X-Factor rikastus valmis! Rikastettu {enriched_count} korttia ({self.xfactor_cache.stats()})", "SUCCESS")
         
     def start_monitoring(self):
         """Start automatic monitoring"""
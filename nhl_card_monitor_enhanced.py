@@ -5,7 +5,6 @@ Automaattinen korttien seuranta ja lisäys master.json:iin
 """
 
 import time
-import json
 import requests
 from bs4 import BeautifulSoup
 import logging
@@ -16,6 +15,10 @@ import threading
 import re
 from typing import List, Dict, Optional, Set
 from urllib.parse import urlparse, parse_qs
+from utils_parse import extract_card_urls, extract_entry_count_text
+from utils_xfactor_cache import XFactorCache
+from utils_changelog import commit_cards
+from utils_master_cache import shared_cache
 
 # Configure console encoding for Windows
 if sys.platform == "win32":
@@ -34,6 +37,9 @@ class NHLCardMonitorEnhanced:
         self.master_data = None
         self.master_urls = set()
         self.new_cards_data = []
+        self.xfactor_cache = XFactorCache()
+        # Parsed master.json, re-read only when the file changes on disk
+        self.master_cache = shared_cache('master.json')
         
         # Configuration
         self.find_cards_url = "https://nhlhutbuilder.com/php/find_cards.php"
@@ -148,15 +154,12 @@ class NHLCardMonitorEnhanced:
             return True  # If we can't check, assume there are new cards
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Find entry_count element
-            entry_count_div = soup.find('div', id='entry_count')
-            if not entry_count_div:
+            entry_text = extract_entry_count_text(response.text)
+            if entry_text is None:
                 self.log_message("Ei loytynyt entry_count elementtia", "WARNING")
                 return True  # If not found, continue search
             
-            entry_text = entry_count_div.get_text().strip()
             self.log_message(f"Entry count teksti: '{entry_text}'", "INFO")
             
             # Parse total count (e.g. "Showing 1 to 40 of 2536 entries")
@@ -170,9 +173,7 @@ class NHLCardMonitorEnhanced:
             
             # Load master.json and compare
             try:
-                with open('master.json', 'r', encoding='utf-8') as f:
-                    master_data = json.load(f)
-                master_count = len(master_data['players'])
+                master_count = self.master_cache.count()
                 self.log_message(f"Master.json maara: {master_count} pelaajaa", "INFO")
                 
                 if total_entries == master_count:
@@ -216,21 +217,8 @@ class NHLCardMonitorEnhanced:
             return []
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find other_card_container divs
-            card_containers = soup.find_all('div', class_='other_card_container')
-            
             # Collect URLs
-            urls = []
-            for container in card_containers:
-                # Find a element
-                link = container.find('a', href=True)
-                if link:
-                    href = link.get('href')
-                    if href:
-                        full_url = f'https://nhlhutbuilder.com/{href}'
-                        urls.append(full_url)
+            urls = extract_card_urls(response.text)
             
             self.log_message(f"Loydetiin {len(urls)} URLia sivulta {page_number}", "SUCCESS")
             return urls
@@ -243,8 +231,7 @@ class NHLCardMonitorEnhanced:
         """Load master.json data"""
         try:
             self.log_message("Ladataan master.json...", "INFO")
-            with open('master.json', 'r', encoding='utf-8') as f:
-                self.master_data = json.load(f)
+            self.master_data = self.master_cache.get()
             players = self.master_data.get('players', [])
             self.master_urls = set()
             for player in players:
@@ -484,46 +471,27 @@ class NHLCardMonitorEnhanced:
             
         self.log_message("Lisataan uudet kortit master.json:iin...", "JSON")
         
-        # Add new cards to master data
-        added_count = 0
-        for card in self.new_cards_data:
-            # Check if player already exists (by player_id)
-            existing_player = None
-            for player in self.master_data['players']:
-                if player.get('player_id') == card.get('player_id'):
-                    existing_player = player
-                    break
-                    
-            if not existing_player:
-                # Add new player
-                self.master_data['players'].append(card)
-                self.master_urls.add(card.get('url', ''))
-                added_count += 1
-                self.log_message(f"Lisatty: {card.get('name', 'Tuntematon')}", "JSON")
-            else:
-                self.log_message(f"Pelaaja jo olemassa: {card.get('name', 'Tuntematon')}", "WARNING")
-                
-        if added_count > 0:
-            # Save updated master.json
-            try:
-                # Create backup
-                backup_filename = f"master_backup_{int(time.time())}.json"
-                with open(backup_filename, 'w', encoding='utf-8') as f:
-                    json.dump(self.master_data, f, indent=2, ensure_ascii=False)
-                self.log_message(f"Varmuuskopio luotu: {backup_filename}", "JSON")
-                
-                # Save updated master.json
-                with open('master.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.master_data, f, indent=2, ensure_ascii=False)
-                    
-                self.log_message(f"Lisatty {added_count} uutta korttia master.json:iin!", "SUCCESS")
-                self.log_message(f"Master.json paivitetty: {len(self.master_data['players'])} pelaajaa", "JSON")
-                
-                # Clear new cards data
-                self.new_cards_data = []
+        # Merge under the master.json writer lock against the latest data on disk (snapshot +
+        # change log), so cards written meanwhile by other monitors are not lost
+        try:
+            result, self.master_data = commit_cards(self.new_cards_data, 'master.json')
+        except Exception as e:
+            self.log_message(f"Virhe master.json:n tallentamisessa: {e}", "ERROR")
+            self.master_cache.invalidate()
+            return
+        self.master_cache.update(self.master_data)
+        self.master_urls = {p['url'] for p in self.master_data['players'] if p.get('url')}
+        for card in result.added:
+            self.log_message(f"Lisatty: {card.get('name', 'Tuntematon')}", "JSON")
+        for card in result.updated:
+            self.log_message(f"Paivitetty: {card.get('name', 'Tuntematon')}", "JSON")
                 
-            except Exception as e:
-                self.log_message(f"Virhe master.json:n tallentamisessa: {e}", "ERROR")
+        if result.changed:
+            self.log_message(f"Master.json tallennettu: {result.summary()}", "SUCCESS")
+            self.log_message(f"Master.json paivitetty: {len(self.master_data['players'])} pelaajaa", "JSON")
+            
+            # Clear new cards data
+            self.new_cards_data = []
         else:
             self.log_message("Ei uusia kortteja lisattavaksi!", "WARNING")
             
@@ -544,7 +512,12 @@ class NHLCardMonitorEnhanced:
                 is_goalie = card.get('is_goalie', False)
                 
                 if player_id:
-                    xfactors = self.fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie)
+                    # Cache hit, or a fetch followed by a pause to be nice to the server
+                    xfactors = self.xfactor_cache.get_or_fetch(
+                        player_id, is_goalie, lambda: self.fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie), delay=0.5)
+                    if xfactors is None:
+                        self.log_message(f"X-Factor haku epaonnistui {card.get('name', 'Tuntematon')}:lle, yritetaan uudelleen seuraavalla kerralla", "WARNING")
+                        continue
                     card['xfactors'] = xfactors
                     
                     if xfactors:
@@ -553,12 +526,11 @@ class NHLCardMonitorEnhanced:
                     else:
                         self.log_message(f"Ei X-Factor kykyja {card.get('name', 'Tuntematon')}:lle", "WARNING")
                         
-                time.sleep(0.5)  # Be nice to the server
-                
-        self.log_message(f"X-Factor rikastus valmis! Rikastettu {enriched_count} korttia", "SUCCESS")
+        self.xfactor_cache.save()
+        self.log_message(f"X-Factor rikastus valmis! Rikastettu {enriched_count} korttia ({self.xfactor_cache.stats()})", "SUCCESS")
         
     def fetch_xfactors_with_tiers(self, player_id, timeout=10, is_goalie=False):
-        """Fetch X-Factor abilities for a player with timeout protection"""
+        """Fetch X-Factor abilities for a player with timeout protection; None if the fetch failed"""
         try:
             if is_goalie:
                 url = f"https://nhlhutbuilder.com/goalie-stats.php?id={player_id}"
@@ -568,7 +540,8 @@ class NHLCardMonitorEnhanced:
             resp = requests.get(url, headers=self.headers, timeout=timeout)
             
             if resp.status_code != 200:
-                return []
+                # Failed, not empty: callers must not cache this as "no X-Factors"
+                return None
             
             soup = BeautifulSoup(resp.text, 'html.parser')
             
@@ -620,7 +593,7 @@ class NHLCardMonitorEnhanced:
             
         except Exception as e:
             self.log_message(f"Error fetching X-Factors for {player_id}: {e}", "ERROR")
-            return []
+            return None
         
     def start_monitoring(self):
         """Start automatic monitoring"""
@@ -10,7 +10,7 @@ import threading
 import time
 import json
 import requests
-from bs4 import BeautifulSoup
+from utils_parse import extract_card_urls, extract_entry_count_text
 import logging
 from datetime import datetime
 import os
@@ -355,15 +355,12 @@ class NHLCardMonitorGUI:
             return True  # If we can't check, assume there are new cards
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Find entry_count element
-            entry_count_div = soup.find('div', id='entry_count')
-            if not entry_count_div:
+            entry_text = extract_entry_count_text(response.text)
+            if entry_text is None:
                 self.log_message("Ei loytynyt entry_count elementtia", "WARNING")
                 return True  # If not found, continue search
             
-            entry_text = entry_count_div.get_text().strip()
             self.log_message(f"Entry count teksti: '{entry_text}'", "INFO")
             
             # Parse total count (e.g. "Showing 1 to 40 of 2536 entries")
@@ -423,21 +420,8 @@ class NHLCardMonitorGUI:
             return []
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find other_card_container divs
-            card_containers = soup.find_all('div', class_='other_card_container')
-            
             # Collect URLs
-            urls = []
-            for container in card_containers:
-                # Find a element
-                link = container.find('a', href=True)
-                if link:
-                    href = link.get('href')
-                    if href:
-                        full_url = f'https://nhlhutbuilder.com/{href}'
-                        urls.append(full_url)
+            urls = extract_card_urls(response.text)
             
             self.log_message(f"Loydetiin {len(urls)} URLia sivulta {page_number}", "SUCCESS")
             return urls
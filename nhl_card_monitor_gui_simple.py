@@ -8,7 +8,6 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import threading
 import time
-import json
 import requests
 from bs4 import BeautifulSoup
 import logging
@@ -18,6 +17,9 @@ import sys
 import re
 from typing import List, Dict, Optional, Set
 from urllib.parse import urlparse, parse_qs
+from utils_parse import extract_card_urls, extract_entry_count_text
+from utils_changelog import commit_cards
+from utils_master_cache import shared_cache
 
 class NHLCardMonitorGUISimple:
     def __init__(self, root):
@@ -33,6 +35,8 @@ class NHLCardMonitorGUISimple:
         self.master_data = None
         self.master_urls = set()
         self.new_cards_data = []
+        # Parsed master.json, re-read only when the file changes on disk
+        self.master_cache = shared_cache('master.json')
         
         # Configuration
         self.find_cards_url = "https://nhlhutbuilder.com/php/find_cards.php"
@@ -272,15 +276,12 @@ class NHLCardMonitorGUISimple:
             return True  # If we can't check, assume there are new cards
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Find entry_count element
-            entry_count_div = soup.find('div', id='entry_count')
-            if not entry_count_div:
+            entry_text = extract_entry_count_text(response.text)
+            if entry_text is None:
                 self.log_message("Ei loytynyt entry_count elementtia", "WARNING")
                 return True  # If not found, continue search
             
-            entry_text = entry_count_div.get_text().strip()
             self.log_message(f"Entry count teksti: '{entry_text}'", "INFO")
             
             # Parse total count (e.g. "Showing 1 to 40 of 2536 entries")
@@ -294,9 +295,7 @@ class NHLCardMonitorGUISimple:
             
             # Load master.json and compare
             try:
-                with open('master.json', 'r', encoding='utf-8') as f:
-                    master_data = json.load(f)
-                master_count = len(master_data['players'])
+                master_count = self.master_cache.count()
                 self.log_message(f"Master.json maara: {master_count} pelaajaa", "INFO")
                 
                 if total_entries == master_count:
@@ -340,21 +339,8 @@ class NHLCardMonitorGUISimple:
             return []
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find other_card_container divs
-            card_containers = soup.find_all('div', class_='other_card_container')
-            
             # Collect URLs
-            urls = []
-            for container in card_containers:
-                # Find a element
-                link = container.find('a', href=True)
-                if link:
-                    href = link.get('href')
-                    if href:
-                        full_url = f'https://nhlhutbuilder.com/{href}'
-                        urls.append(full_url)
+            urls = extract_card_urls(response.text)
             
             self.log_message(f"Loydetiin {len(urls)} URLia sivulta {page_number}", "SUCCESS")
             return urls
@@ -368,8 +354,7 @@ class NHLCardMonitorGUISimple:
         try:
             self.update_status("Ladataan master.json...")
             self.log_message("Ladataan master.json...", "INFO")
-            with open('master.json', 'r', encoding='utf-8') as f:
-                self.master_data = json.load(f)
+            self.master_data = self.master_cache.get()
             players = self.master_data.get('players', [])
             self.master_urls = set()
             for player in players:
@@ -799,74 +784,32 @@ class NHLCardMonitorGUISimple:
             self.update_status("Lisätään uudet kortit master.json:iin...")
             self.log_message("Lisätään uudet kortit master.json:iin...", "JSON")
             
-            # Add new cards to master data
-            added_count = 0
-            skipped_count = 0
-            
-            for card in self.new_cards_data:
-                # Check if player already exists (by unique_id, player_id+is_goalie, or URL)
-                existing_player = None
-                card_unique_id = card.get('unique_id')
-                card_player_id = card.get('player_id')
-                card_is_goalie = card.get('is_goalie')
-                card_url = card.get('url')
-                
-                for player in self.master_data['players']:
-                    # Check by unique_id first
-                    if card_unique_id and player.get('unique_id') == card_unique_id:
-                        existing_player = player
-                        break
-                    # Check by player_id + is_goalie combination
-                    elif (player.get('player_id') == card_player_id and 
-                          player.get('is_goalie') == card_is_goalie):
-                        existing_player = player
-                        break
-                    # Check by URL as fallback
-                    elif player.get('url') == card_url:
-                        existing_player = player
-                        break
-                        
-                if not existing_player:
-                    # Add new player
-                    self.master_data['players'].append(card)
-                    self.master_urls.add(card.get('url', ''))
-                    added_count += 1
-                    player_type = "Maalivahti" if card_is_goalie else "Kenttäpelaaja"
-                    self.log_message(f"Lisätty: {card.get('name', 'Tuntematon')} (ID: {card_player_id}, {player_type})", "JSON")
-                else:
-                    skipped_count += 1
-                    player_type = "Maalivahti" if card_is_goalie else "Kenttäpelaaja"
-                    self.log_message(f"Pelaaja jo olemassa: {card.get('name', 'Tuntematon')} (ID: {card_player_id}, {player_type})", "WARNING")
+            # Merge under the master.json writer lock against the latest data on disk (snapshot +
+            # change log), so cards written meanwhile by other monitors are not lost
+            try:
+                result, self.master_data = commit_cards(self.new_cards_data, 'master.json')
+            except Exception as e:
+                self.log_message(f"Virhe master.json:n tallentamisessa: {e}", "ERROR")
+                self.master_cache.invalidate()
+                self.update_status(f"Virhe: {e}")
+                return
+            self.master_cache.update(self.master_data)
+            self.master_urls = {p['url'] for p in self.master_data['players'] if p.get('url')}
+            for card in result.added:
+                player_type = "Maalivahti" if card.get('is_goalie') else "Kenttäpelaaja"
+                self.log_message(f"Lisätty: {card.get('name', 'Tuntematon')} (ID: {card.get('player_id')}, {player_type})", "JSON")
+            for card in result.updated:
+                player_type = "Maalivahti" if card.get('is_goalie') else "Kenttäpelaaja"
+                self.log_message(f"Päivitetty: {card.get('name', 'Tuntematon')} (ID: {card.get('player_id')}, {player_type})", "JSON")
                     
-            if added_count > 0:
-                # Create backup
-                import time
-                backup_filename = f"master_backup_{int(time.time())}.json"
-                try:
-                    with open(backup_filename, 'w', encoding='utf-8') as f:
-                        json.dump(self.master_data, f, indent=2, ensure_ascii=False)
-                    self.log_message(f"Varmuuskopio luotu: {backup_filename}", "JSON")
-                except Exception as e:
-                    self.log_message(f"Virhe varmuuskopion luomisessa: {e}", "ERROR")
+            if result.changed:
+                self.log_message(f"Master.json tallennettu: {result.summary()}", "SUCCESS")
+                self.log_message(f"Master.json päivitetty: {len(self.master_data['players'])} pelaajaa", "JSON")
+                self.update_status(f"Lisätty {len(result.added)} uutta korttia master.json:iin!")
                 
-                # Save updated master.json
-                try:
-                    with open('master.json', 'w', encoding='utf-8') as f:
-                        json.dump(self.master_data, f, indent=2, ensure_ascii=False)
-                        
-                    self.log_message(f"Lisätty {added_count} uutta korttia master.json:iin!", "SUCCESS")
-                    if skipped_count > 0:
-                        self.log_message(f"Hypätty {skipped_count} korttia (jo olemassa)", "WARNING")
-                    self.log_message(f"Master.json päivitetty: {len(self.master_data['players'])} pelaajaa", "JSON")
-                    self.update_status(f"Lisätty {added_count} uutta korttia master.json:iin!")
-                    
-                    # Clear new cards data
-                    self.new_cards_data = []
-                    self.display_new_cards([])  # Clear the display
-                    
-                except Exception as e:
-                    self.log_message(f"Virhe master.json:n tallentamisessa: {e}", "ERROR")
-                    self.update_status(f"Virhe: {e}")
+                # Clear new cards data
+                self.new_cards_data = []
+                self.display_new_cards([])  # Clear the display
             else:
                 self.log_message("Ei uusia kortteja lisättäväksi!", "WARNING")
                 self.update_status("Ei uusia kortteja lisättäväksi!")
@@ -5,7 +5,6 @@ Automaattinen korttien seuranta konsoli-ympäristössä
 """
 
 import time
-import json
 import requests
 from bs4 import BeautifulSoup
 import logging
@@ -16,6 +15,9 @@ import threading
 import re
 from typing import List, Dict, Optional, Set
 from urllib.parse import urlparse, parse_qs
+from utils_parse import extract_card_urls, extract_entry_count_text
+from utils_xfactor_cache import XFactorCache
+from utils_master_cache import shared_cache
 
 # Configure console encoding for Windows
 if sys.platform == "win32":
@@ -34,6 +36,9 @@ class NHLCardMonitorStandalone:
         self.master_data = None
         self.master_urls = set()
         self.new_cards_data = []
+        self.xfactor_cache = XFactorCache()
+        # Parsed master.json, re-read only when the file changes on disk
+        self.master_cache = shared_cache('master.json')
         
         # Configuration
         self.find_cards_url = "https://nhlhutbuilder.com/php/find_cards.php"
@@ -145,15 +150,12 @@ class NHLCardMonitorStandalone:
             return True  # If we can't check, assume there are new cards
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
             # Find entry_count element
-            entry_count_div = soup.find('div', id='entry_count')
-            if not entry_count_div:
+            entry_text = extract_entry_count_text(response.text)
+            if entry_text is None:
                 self.log_message("Ei loytynyt entry_count elementtia", "WARNING")
                 return True  # If not found, continue search
             
-            entry_text = entry_count_div.get_text().strip()
             self.log_message(f"Entry count teksti: '{entry_text}'", "INFO")
             
             # Parse total count (e.g. "Showing 1 to 40 of 2536 entries")
@@ -167,9 +169,7 @@ class NHLCardMonitorStandalone:
             
             # Load master.json and compare
             try:
-                with open('master.json', 'r', encoding='utf-8') as f:
-                    master_data = json.load(f)
-                master_count = len(master_data['players'])
+                master_count = self.master_cache.count()
                 self.log_message(f"Master.json maara: {master_count} pelaajaa", "INFO")
                 
                 if total_entries == master_count:
@@ -213,21 +213,8 @@ class NHLCardMonitorStandalone:
             return []
         
         try:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find other_card_container divs
-            card_containers = soup.find_all('div', class_='other_card_container')
-            
             # Collect URLs
-            urls = []
-            for container in card_containers:
-                # Find a element
-                link = container.find('a', href=True)
-                if link:
-                    href = link.get('href')
-                    if href:
-                        full_url = f'https://nhlhutbuilder.com/{href}'
-                        urls.append(full_url)
+            urls = extract_card_urls(response.text)
             
             self.log_message(f"Loydetiin {len(urls)} URLia sivulta {page_number}", "SUCCESS")
             return urls
@@ -240,8 +227,7 @@ class NHLCardMonitorStandalone:
         """Load master.json data"""
         try:
             self.log_message("Ladataan master.json...", "INFO")
-            with open('master.json', 'r', encoding='utf-8') as f:
-                self.master_data = json.load(f)
+            self.master_data = self.master_cache.get()
             players = self.master_data.get('players', [])
             self.master_urls = set()
             for player in players:
@@ -464,7 +450,7 @@ class NHLCardMonitorStandalone:
         print("=" * 80)
         
     def fetch_xfactors_with_tiers(self, player_id, timeout=10, is_goalie=False):
-        """Fetch X-Factor abilities for a player with timeout protection"""
+        """Fetch X-Factor abilities for a player with timeout protection; None if the fetch failed"""
         try:
             if is_goalie:
                 url = f"https://nhlhutbuilder.com/goalie-stats.php?id={player_id}"
@@ -474,7 +460,8 @@ class NHLCardMonitorStandalone:
             resp = requests.get(url, headers=self.headers, timeout=timeout)
             
             if resp.status_code != 200:
-                return []
+                # Failed, not empty: callers must not cache this as "no X-Factors"
+                return None
             
             soup = BeautifulSoup(resp.text, 'html.parser')
             
@@ -526,7 +513,7 @@ class NHLCardMonitorStandalone:
             
         except Exception as e:
             self.log_message(f"Error fetching X-Factors for {player_id}: {e}", "ERROR")
-            return []
+            return None
         
     def enrich_xfactors(self):
         """Enrich selected cards with X-Factor data"""
@@ -545,7 +532,12 @@ class NHLCardMonitorStandalone:
                 is_goalie = card.get('is_goalie', False)
                 
                 if player_id:
-                    xfactors = self.fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie)
+                    # Cache hit, or a fetch followed by a pause to be nice to the server
+                    xfactors = self.xfactor_cache.get_or_fetch(
+                        player_id, is_goalie, lambda: self.fetch_xfactors_with_tiers(player_id, is_goalie=is_goalie), delay=0.5)
+                    if xfactors is None:
+                        self.log_message(f"X-Factor haku epaonnistui {card.get('name', 'Tuntematon')}:lle, yritetaan uudelleen seuraavalla kerralla", "WARNING")
+                        continue
                     card['xfactors'] = xfactors
                     
                     if xfactors:
@@ -554,9 +546,8 @@ class NHLCardMonitorStandalone:
                     else:
                         self.log_message(f"Ei X-Factor kykyja {card.get('name', 'Tuntematon')}:lle", "WARNING")
                         
-                time.sleep(0.5)  # Be nice to the server
-                
-        self.log_message(f"X-Factor rikastus valmis! Rikastettu {enriched_count} korttia", "SUCCESS")
+        self.xfactor_cache.save()
+        self.log_message(f"X-Factor rikastus valmis! Rikastettu {enriched_count} korttia ({self.xfactor_cache.stats()})", "SUCCESS")
         
     def start_monitoring(self):
         """Start automatic monitoring"""
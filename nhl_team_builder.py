@@ -7,15 +7,22 @@ Suunnittele kokoonpanoja ja peliketjuja master.json datan pohjalta
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, simpledialog, filedialog
 import json
-import requests
 from PIL import Image, ImageTk
-import io
-import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Set
 import os
 import sys
 from datetime import datetime
+from utils_card_store import CardStore, DEFAULT_DB_PATH
+from utils_lazy_catalog import LazyCatalog
+from utils_card_art import SLOT_SIZE, CardArtStore, card_image_url
+
+# Card images are decoded by a fixed pool of loader threads, and decoded images are kept
+# per URL so reassigning players or reloading a team shows them without decoding again
+IMAGE_LOADER_WORKERS = 4
+IMAGE_CACHE_SIZE = 96
 
 class NHLTeamBuilder:
     def __init__(self, root):
@@ -26,6 +33,12 @@ class NHLTeamBuilder:
         
         # Variables
         self.master_data = None
+        self.catalog = None
+        self.art_store = CardArtStore()
+        self.image_pool = ThreadPoolExecutor(max_workers=IMAGE_LOADER_WORKERS, thread_name_prefix='card-image')
+        self.image_cache = OrderedDict()  # image URL -> PhotoImage, least recently used first
+        self.image_requests = {}  # slot_id -> (request id, Future) of the slot's latest load
+        self.image_request_seq = 0
         self.players = []
         self.filtered_players = []
         self.current_team = {}
@@ -78,12 +91,22 @@ class NHLTeamBuilder:
             print(formatted_message.strip())
         
     def load_master_data(self):
-        """Load master.json data"""
+        """Load master.json data (or master.db when the SQLite card store is in use)"""
         try:
-            with open('master.json', 'r', encoding='utf-8') as f:
-                self.master_data = json.load(f)
+            if os.path.exists(DEFAULT_DB_PATH):
+                # master.json + change log is authoritative; bring the database up to date first
+                store = CardStore(DEFAULT_DB_PATH)
+                store.sync_from_json('master.json')
+                self.master_data = {'players': store.players()}
+                source = DEFAULT_DB_PATH
+            else:
+                # Only the summary table is loaded (includes cards still waiting in
+                # master.changes.ndjson); full cards are read on demand
+                self.catalog = LazyCatalog('master.json')
+                self.master_data = {'players': self.catalog.summaries}
+                source = 'master.json'
             self.players = self.master_data.get('players', [])
-            print(f"Loaded {len(self.players)} players from master.json")
+            print(f"Loaded {len(self.players)} players from {source}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load master.json: {e}")
             
@@ -647,6 +670,7 @@ class NHLTeamBuilder:
         else:
             slot_frame.info_label.config(text="Empty", fg='#666666')
             # Clear image when slot is empty
+            self._cancel_image_load(slot_frame.slot_id)
             slot_frame.image_label.config(image='', text='')
             
     def load_card_image(self, slot_frame, player):
@@ -655,36 +679,24 @@ class NHLTeamBuilder:
             player_name = player.get('name', 'Unknown')
             self.log_message(f"Loading card image for player: {player_name}", "INFO")
             
-            # Try different image URL fields
-            image_url = (player.get('image_url', '') or 
-                        player.get('card_image', '') or 
-                        player.get('image', '') or 
-                        player.get('card_art', ''))
-            
-            # If we have a relative path, make it absolute
-            if image_url and not image_url.startswith('http'):
-                if image_url.startswith('images/'):
-                    image_url = f"https://nhlhutbuilder.com/{image_url}"
-                else:
-                    image_url = f"https://nhlhutbuilder.com/{image_url}"
-            
-            if not image_url:
-                # Try to get image from URL field
-                url = player.get('url', '')
-                if url:
-                    # Extract player ID and construct image URL
-                    player_id = self.extract_player_id_from_url(url)
-                    if player_id:
-                        image_url = f"https://nhlhutbuilder.com/card_images/{player_id}.png"
-                        self.log_message(f"Constructed image URL: {image_url}", "INFO")
+            image_url = card_image_url(player)
                 
-            if image_url:
+            if image_url in self.image_cache:
+                # Decoded before: no thread, no disk access
+                self.image_cache.move_to_end(image_url)
+                self._cancel_image_load(slot_frame.slot_id)
+                self._update_image(slot_frame, self.image_cache[image_url])
+            elif image_url:
                 self.log_message(f"Loading image from: {image_url}", "INFO")
-                # Load image in background thread
-                threading.Thread(target=self._load_image_thread, 
-                               args=(slot_frame, image_url), 
-                               daemon=True).start()
+                # Load image on the loader pool; this supersedes any pending load of the slot
+                self._cancel_image_load(slot_frame.slot_id)
+                self.image_request_seq += 1
+                request_id = self.image_request_seq
+                self.image_requests[slot_frame.slot_id] = (request_id, None)
+                future = self.image_pool.submit(self._load_image_thread, slot_frame, image_url, request_id)
+                self.image_requests[slot_frame.slot_id] = (request_id, future)
             else:
+                self._cancel_image_load(slot_frame.slot_id)
                 self.log_message("No image URL found", "WARNING")
                 # Show placeholder
                 slot_frame.image_label.config(text="No Image", fg='#666666')
@@ -693,36 +705,70 @@ class NHLTeamBuilder:
             self.log_message(f"Error loading card image: {e}", "ERROR")
             slot_frame.image_label.config(text="Error", fg='#ff0000')
             
-    def _load_image_thread(self, slot_frame, image_url):
-        """Load image in background thread"""
+    def _cancel_image_load(self, slot_id):
+        """Drop the slot's pending image load: a queued one never runs, a running one is discarded"""
+        request_id, future = self.image_requests.pop(slot_id, (None, None))
+        if future is not None:
+            future.cancel()
+            
+    def _is_current_load(self, slot_id, request_id):
+        """True while request_id is still the slot's latest image load"""
+        return self.image_requests.get(slot_id, (None, None))[0] == request_id
+        
+    def _load_image_thread(self, slot_frame, image_url, request_id):
+        """Load image on a loader-pool thread"""
+        if not self._is_current_load(slot_frame.slot_id, request_id):
+            return
         try:
-            self.log_message(f"Fetching image: {image_url}", "INFO")
-            response = requests.get(image_url, timeout=10)
-            self.log_message(f"Response status: {response.status_code}", "INFO")
+            # Slot-size thumbnail from the card-art store (pre-generated by
+            # utils_card_art.py sync); the network is only used when the original is
+            # missing or due for revalidation
+            path = self.art_store.thumbnail(image_url) or self.art_store.fetch(image_url)
             
-            if response.status_code == 200:
-                self.log_message(f"Image loaded successfully, size: {len(response.content)} bytes", "SUCCESS")
+            if path:
+                self.log_message(f"Image ready: {path}", "SUCCESS")
                 # Load image with PIL
-                image = Image.open(io.BytesIO(response.content))
+                image = Image.open(path)
                 self.log_message(f"PIL image loaded: {image.size}", "SUCCESS")
                 
-                # Resize to fit slot (120x160 to fill the entire card)
-                image.thumbnail((120, 160), Image.Resampling.LANCZOS)
+                # Resize to fit slot (120x160 to fill the entire card); a no-op for thumbnails
+                image.thumbnail(SLOT_SIZE, Image.Resampling.LANCZOS)
                 self.log_message(f"Image resized to: {image.size}", "SUCCESS")
                 
-                # Convert to PhotoImage
-                photo = ImageTk.PhotoImage(image)
-                self.log_message("PhotoImage created successfully", "SUCCESS")
+                image.load()
                 
-                # Update UI in main thread
-                self.root.after(0, self._update_image, slot_frame, photo)
+                # Create the PhotoImage and update UI in main thread
+                self.root.after(0, self._finish_image_load, slot_frame, image_url, request_id, image)
             else:
-                self.log_message(f"HTTP error: {response.status_code}", "ERROR")
-                self.root.after(0, self._update_image_error, slot_frame)
+                self.log_message(f"Image not available: {image_url}", "ERROR")
+                self.root.after(0, self._finish_image_error, slot_frame, request_id)
                 
         except Exception as e:
             self.log_message(f"Error loading image {image_url}: {e}", "ERROR")
-            self.root.after(0, self._update_image_error, slot_frame)
+            self.root.after(0, self._finish_image_error, slot_frame, request_id)
+            
+    def _finish_image_load(self, slot_frame, image_url, request_id, image):
+        """Cache the decoded image and show it if the slot still wants it (main thread)"""
+        try:
+            photo = ImageTk.PhotoImage(image)
+        except Exception as e:
+            self.log_message(f"Error creating PhotoImage: {e}", "ERROR")
+            self._finish_image_error(slot_frame, request_id)
+            return
+        # Cached even when superseded: the player may well be put back into a slot
+        self.image_cache[image_url] = photo
+        self.image_cache.move_to_end(image_url)
+        while len(self.image_cache) > IMAGE_CACHE_SIZE:
+            self.image_cache.popitem(last=False)
+        if self._is_current_load(slot_frame.slot_id, request_id):
+            self.image_requests.pop(slot_frame.slot_id, None)
+            self._update_image(slot_frame, photo)
+            
+    def _finish_image_error(self, slot_frame, request_id):
+        """Show the error placeholder unless a newer load replaced this one (main thread)"""
+        if self._is_current_load(slot_frame.slot_id, request_id):
+            self.image_requests.pop(slot_frame.slot_id, None)
+            self._update_image_error(slot_frame)
             
     def _update_image(self, slot_frame, photo):
         """Update image in main thread"""
@@ -809,6 +855,12 @@ class NHLTeamBuilder:
         else:
             self.remaining_label.config(fg='#2196F3')
             
+    def full_record(self, player):
+        """Full card for a list entry (list entries are summaries when the lazy catalog is used)"""
+        if player and self.catalog:
+            return self.catalog.record_for(player) or player
+        return player
+        
     def save_team(self):
         """Save current team"""
         team_name = simpledialog.askstring("Save Team", "Enter team name:")
@@ -817,7 +869,7 @@ class NHLTeamBuilder:
             
         team_data = {
             'name': team_name,
-            'players': self.team_slots,
+            'players': {slot_id: self.full_record(p) for slot_id, p in self.team_slots.items()},
             'budget': self.budget,
             'spent': self.current_spend,
             'timestamp': time.time()
@@ -876,6 +928,7 @@ def main():
     
     # Handle window close
     def on_closing():
+        app.image_pool.shutdown(wait=False, cancel_futures=True)
         root.destroy()
         
     root.protocol("WM_DELETE_WINDOW", on_closing)
@@ -10,7 +10,8 @@ import time
 import logging
 import re
 from typing import List, Dict, Tuple, Optional, Set
-from bs4 import BeautifulSoup
+from utils_parse import extract_card_urls, extract_entry_count_text
+from utils_master_cache import shared_cache
 from dataclasses import dataclass
 
 # Configuration
@@ -97,15 +98,12 @@ def check_total_entries() -> bool:
         return True  # If we can't check, assume there are new cards
     
     try:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
         # Etsi entry_count elementti
-        entry_count_div = soup.find('div', id='entry_count')
-        if not entry_count_div:
+        entry_text = extract_entry_count_text(response.text)
+        if entry_text is None:
             logger.warning("⚠️ Ei löytynyt entry_count elementtiä")
             return True  # Jos ei löydy, jatka hakua
         
-        entry_text = entry_count_div.get_text().strip()
         logger.info(f"📊 Entry count teksti: '{entry_text}'")
         
         # Parsi kokonaismäärä (esim. "Showing 1 to 40 of 2536 entries")
@@ -119,9 +117,7 @@ def check_total_entries() -> bool:
         
         # Lataa master.json ja vertaa
         try:
-            with open('master.json', 'r', encoding='utf-8') as f:
-                master_data = json.load(f)
-            master_count = len(master_data['players'])
+            master_count = shared_cache('master.json').count()
             logger.info(f"📊 Master.json määrä: {master_count} pelaajaa")
             
             if total_entries == master_count:
@@ -174,21 +170,8 @@ def fetch_cards_page(page_number: int = 1, limit: int = None) -> List[str]:
         return []
     
     try:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Etsi other_card_container divit
-        card_containers = soup.find_all('div', class_='other_card_container')
-        
         # Kerää URLit
-        urls = []
-        for container in card_containers:
-            # Etsi a-elementti
-            link = container.find('a', href=True)
-            if link:
-                href = link.get('href')
-                if href:
-                    full_url = f'https://nhlhutbuilder.com/{href}'
-                    urls.append(full_url)
+        urls = extract_card_urls(response.text)
         
         logger.info(f"✅ Löydettiin {len(urls)} URLia sivulta {page_number}")
         return urls
@@ -206,8 +189,7 @@ def load_master_json() -> Tuple[Optional[Dict], List[Dict]]:
     """
     logger.info("📂 Ladataan master.json...")
     try:
-        with open('master.json', 'r', encoding='utf-8') as f:
-            master_data = json.load(f)
+        master_data = shared_cache('master.json').get()
         players = master_data.get('players', [])
         logger.info(f"✅ Master.json ladattu: {len(players)} pelaajaa")
         return master_data, players
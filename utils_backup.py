@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Atomic master.json writes with incremental, compressed backups
+master.json kirjoitetaan väliaikaistiedoston ja uudelleennimeämisen kautta. Jokaisesta
+kirjoituksesta tallennetaan gzip-pakattu muutos (delta) edelliseen tilaan nähden, joten
+mikä tahansa aiempi tila voidaan palauttaa.
+Ketju on yksi täysi perustila ja enintään DELTAS_PER_BASE deltaa, ja yli RETENTION_DAYS
+päivää vanhat ketjut poistetaan. Muutoslokin tiivistys sekä gui_simple- ja enhanced-monitorit
+kirjoittavat tämän kautta vanhojen master_backup_<ts>.json-kopioiden sijaan.
+
+Usage:
+    python utils_backup.py list
+    python utils_backup.py restore --at "2025-09-01 12:00" --out master_restored.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from utils_card_store import card_key
+from utils_snapshot import write_snapshot
+
+DEFAULT_BACKUP_DIR = 'master_backups'
+
+# A chain (full base + deltas) older than this is deleted; the newest chain is always kept
+RETENTION_DAYS = 30
+
+# Start a new full base after this many deltas so a restore never replays too many
+DELTAS_PER_BASE = 50
+
+
+def atomic_write_json(path: str, data, indent: int = 2) -> None:
+    """json.dump to a temp file in the same directory, fsync, then rename over path"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _file_signature(path: str) -> Optional[list]:
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _write_gz(path: str, payload: Dict) -> None:
+
+    tmp_path = f'{path}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _read_gz(path: str) -> Dict:
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_delta(old: Dict, new: Dict) -> Dict:
+    """Changes that turn old into new: upserted cards by key, removed keys, and the
+    key order only when it is not simply old order + appended cards."""
+    old_players = old.get('players', [])
+    new_players = new.get('players', [])
+    old_by_key = {card_key(p): p for p in old_players}
+    new_keys = [card_key(p) for p in new_players]
+    upserts = {}
+    for key, card in zip(new_keys, new_players):
+        if old_by_key.get(key) != card:
+            upserts[key] = card
+    new_key_set = set(new_keys)
+    removed = [key for key in old_by_key if key not in new_key_set]
+    delta = {'upserts': upserts, 'removed': removed}
+    extra = {k: v for k, v in new.items() if k != 'players'}
+    if extra != {k: v for k, v in old.items() if k != 'players'}:
+        delta['extra'] = extra
+    if _apply_order(old_players, upserts, removed) != new_keys:
+        delta['order'] = new_keys
+    return delta
+
+
+def _apply_order(old_players: List[Dict], upserts: Dict, removed: List[str]) -> List[str]:
+
+    removed = set(removed)
+    keys = [card_key(p) for p in old_players if card_key(p) not in removed]
+    seen = set(keys)
+    keys.extend(k for k in upserts if k not in seen)
+    return keys
+
+
+def _is_empty_delta(delta: Dict) -> bool:
+
+    return not delta['upserts'] and not delta['removed'] and 'extra' not in delta and 'order' not in delta
+
+
+def _has_duplicate_keys(data: Dict) -> bool:
+
+    keys = [card_key(p) for p in data.get('players', [])]
+    return len(set(keys)) != len(keys)
+
+
+def apply_delta(old: Dict, delta: Dict) -> Dict:
+    by_key = {card_key(p): p for p in old.get('players', [])}
+    order = delta.get('order') or _apply_order(old.get('players', []), delta['upserts'], delta['removed'])
+    for key in delta['removed']:
+        by_key.pop(key, None)
+    by_key.update(delta['upserts'])
+    extra = delta.get('extra', {k: v for k, v in old.items() if k != 'players'})
+    result = {'players': [by_key[key] for key in order]}
+    result.update(extra)
+    return result
+
+
+class MasterBackups:
+    """Backup chains in backup_dir: <ms>_base.json.gz holds a full snapshot and each
+    <ms>_delta.json.gz the changes from the previous point in time.
+
+    head.json remembers the newest backup point and the (mtime_ns, size) master.json had
+    right after write_master wrote it. While both still match, the file on disk is known
+    to be the chain's last state, so a write needs no digest or backup read to extend it.
+    """
+
+    def __init__(self, backup_dir: str = DEFAULT_BACKUP_DIR, retention_days: float = RETENTION_DAYS,
+                 deltas_per_base: int = DELTAS_PER_BASE):
+        self.backup_dir = backup_dir
+        self.retention_days = retention_days
+        self.deltas_per_base = deltas_per_base
+        self.head_path = os.path.join(backup_dir, 'head.json')
+
+    def entries(self) -> List[tuple]:
+        """[(ms, kind, path)] oldest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        found = []
+        for name in os.listdir(self.backup_dir):
+            if not name.endswith('.json.gz'):
+                continue
+            stamp, _, kind = name[:-len('.json.gz')].partition('_')
+            if stamp.isdigit() and kind in ('base', 'delta'):
+                found.append((int(stamp), kind, os.path.join(self.backup_dir, name)))
+        return sorted(found)
+
+    def _next_stamp(self, entries) -> int:
+
+        stamp = int(time.time() * 1000)
+        return max(stamp, entries[-1][0] + 1) if entries else stamp
+
+    def _read_head(self) -> Optional[Dict]:
+
+        try:
+            with open(self.head_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def mark_written(self, source: Optional[list]) -> None:
+        """Remember the master file signature right after it was written with the newest backup point"""
+        entries = self.entries()
+        if not entries:
+            return
+        tmp_path = f'{self.head_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'stamp': entries[-1][0], 'source': source}, f)
+        os.replace(tmp_path, self.head_path)
+
+    def record(self, old: Optional[Dict], new: Dict, source: Optional[list] = None) -> Optional[str]:
+        """Store the step old -> new; returns the backup file written (None if unchanged).
+
+        `source` is the signature of the file old was read from. If it is the one saved by
+        mark_written after the last backup, old continues the chain; otherwise old is
+        stored as a new full base first.
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        entries = self.entries()
+        head = self._read_head()
+        chain_ok = (old is not None and entries and source is not None and head is not None
+                    and head.get('stamp') == entries[-1][0] and head.get('source') == source)
+        deltas_since_base = 0
+        for _, kind, _ in reversed(entries):
+            if kind == 'base':
+                break
+            deltas_since_base += 1
+
+        if not chain_ok and old is not None:
+            # Unknown starting point (first backup, or master.json edited outside this module)
+            stamp = self._next_stamp(entries)
+            _write_gz(os.path.join(self.backup_dir, f'{stamp}_base.json.gz'), {'snapshot': old})
+            entries.append((stamp, 'base', None))
+            deltas_since_base = 0
+            chain_ok = True
+
+        # Deltas are keyed by card identity, so a catalog with duplicate identities gets a full copy
+        duplicates = any(_has_duplicate_keys(d) for d in (old, new) if d is not None)
+        delta = make_delta(old, new) if chain_ok and not duplicates else None
+        if delta is not None and _is_empty_delta(delta):
+            return None
+        stamp = self._next_stamp(entries)
+        if delta is None or deltas_since_base >= self.deltas_per_base:
+            path = os.path.join(self.backup_dir, f'{stamp}_base.json.gz')
+            _write_gz(path, {'snapshot': new})
+        else:
+            path = os.path.join(self.backup_dir, f'{stamp}_delta.json.gz')
+            _write_gz(path, {'delta': delta})
+        self.prune()
+        return path
+
+    def prune(self) -> int:
+        """Delete chains whose newest point is older than retention_days; returns files removed"""
+        entries = self.entries()
+        chains, current = [], []
+        for entry in entries:
+            if entry[1] == 'base' and current:
+                chains.append(current)
+                current = []
+            current.append(entry)
+        if current:
+            chains.append(current)
+        cutoff = (time.time() - self.retention_days * 86400) * 1000
+        removed = 0
+        for chain in chains[:-1]:
+            if chain[-1][0] < cutoff:
+                for _, _, path in chain:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def iter_states(self) -> Iterator[tuple]:
+        """(ms, master data) at every backup point, oldest first"""
+        data = None
+        for stamp, kind, path in self.entries():
+            payload = _read_gz(path)
+            if kind == 'base':
+                data = payload['snapshot']
+            elif data is not None:
+                data = apply_delta(data, payload['delta'])
+            else:
+                # Delta whose base was pruned
+                continue
+            yield stamp, data
+
+    def restore(self, at_ms: int = None) -> Dict:
+        """Rebuild the master data as it was at at_ms (default: latest backup)"""
+        entries = [e for e in self.entries() if at_ms is None or e[0] <= at_ms]
+        if not entries:
+            raise ValueError('no backup at or before the requested time')
+        base_index = max(i for i, e in enumerate(entries) if e[1] == 'base')
+        data = _read_gz(entries[base_index][2])['snapshot']
+        for _, _, path in entries[base_index + 1:]:
+            data = apply_delta(data, _read_gz(path)['delta'])
+        return data
+
+
+def write_master(data: Dict, path: str = 'master.json', backups: MasterBackups = None,
+                 old: Dict = None) -> Optional[str]:
+    """Record a backup step from the current file to data, replace path atomically and
+    refresh its binary snapshot. Returns the backup file written, if any.
+
+    Pass the current contents as `old` when already loaded; otherwise the file is re-read.
+    """
+    backups = backups or MasterBackups(os.path.join(os.path.dirname(os.path.abspath(path)), DEFAULT_BACKUP_DIR))
+    source = _file_signature(path)
+    if old is None and source is not None:
+        with open(path, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+    backup_path = backups.record(old, data, source)
+    atomic_write_json(path, data)
+    backups.mark_written(_file_signature(path))
+    try:
+        write_snapshot(data, path)
+    except OSError:
+        # The snapshot is only a load accelerator; a stale one is ignored by readers
+        pass
+    return backup_path
+
+
+def _parse_time(text: str) -> int:
+
+    if text.isdigit():
+        return int(text) if len(text) > 10 else int(text) * 1000
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(text, fmt).timestamp() * 1000)
+        except ValueError:
+            pass
+    raise ValueError(f"unrecognized time: {text}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='List or restore master.json backups')
+    ap.add_argument('command', choices=['list', 'restore', 'prune'])
+    ap.add_argument('--dir', default=DEFAULT_BACKUP_DIR, help='Backup directory (default: master_backups)')
+    ap.add_argument('--at', help='restore: point in time (YYYY-MM-DD[ HH:MM[:SS]] or unix time)')
+    ap.add_argument('--out', default='master_restored.json', help='restore: output file (default: master_restored.json)')
+    args = ap.parse_args()
+
+    backups = MasterBackups(args.dir)
+    if args.command == 'list':
+        for stamp, kind, path in backups.entries():
+            when = datetime.fromtimestamp(stamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{when}  {kind:5s}  {os.path.getsize(path):>9d} B  {path}")
+    elif args.command == 'prune':
+        print(f"Removed {backups.prune()} backup files")
+    else:
+        try:
+            data = backups.restore(_parse_time(args.at) if args.at else None)
+        except ValueError as e:
+            print(f"Failed: {e}")
+            return 1
+        atomic_write_json(args.out, data)
+        print(f"Restored {len(data.get('players', []))} players to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Per-card stat history as delta-encoded time series
+Jokaisesta kortista tallennetaan vain muuttuneet kentät aikaleimoineen (SQLite,
+card_history.db). Kortin tai koko katalogin tila minä tahansa hetkenä saadaan kokoamalla
+deltat viimeisimmästä perustilasta, ja tiivistys yhdistää vanhat deltat yhdeksi perustilaksi.
+seed tuo historiaan vanhat master_backup_*.json-kopiot ja master_backups/-ketjun. Mittaus ja
+tarkistus: python -m benchmarks.bench_card_history.
+
+Usage:
+    python utils_card_history.py seed                       # master_backup_*.json, master_backups/, master.json
+    python utils_card_history.py show S3764 --field overall # when did overall change
+    python utils_card_history.py asof S3764 --at "2025-09-01"
+    python utils_card_history.py compact --keep-days 90
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from utils_backup import DEFAULT_BACKUP_DIR, MasterBackups
+from utils_card_store import card_key
+
+DEFAULT_HISTORY_PATH = 'card_history.db'
+
+# compact() folds deltas older than this into one base row per card
+KEEP_DAYS = 90
+
+# Each row is a delta {"set": {...}, "unset": [...]} against the previous row of the same
+# card; base rows hold the full card in "set" and reset the state
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_key TEXT NOT NULL,
+    ts       REAL NOT NULL,
+    base     INTEGER NOT NULL DEFAULT 0,
+    delta    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_card_ts ON history(card_key, ts);
+CREATE TABLE IF NOT EXISTS latest (
+    card_key TEXT PRIMARY KEY,
+    ts       REAL NOT NULL,
+    data     TEXT NOT NULL
+);
+"""
+
+
+def history_path_for(path: str) -> str:
+    """card_history.db next to master.json / master.db"""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), DEFAULT_HISTORY_PATH)
+
+
+def make_card_delta(old: Dict, new: Dict) -> Dict:
+    """Fields of new that differ from old, and fields old had that new lacks"""
+    changed = {field: value for field, value in new.items() if field not in old or old[field] != value}
+    removed = [field for field in old if field not in new]
+    return {'set': changed, 'unset': removed} if removed else {'set': changed}
+
+
+def _apply(state: Optional[Dict], delta: Dict, base: bool) -> Dict:
+
+    state = {} if base or state is None else dict(state)
+    state.update(delta['set'])
+    for field in delta.get('unset', ()):
+        state.pop(field, None)
+    return state
+
+
+def _key(conn, card_or_key) -> str:
+
+    if not isinstance(card_or_key, str):
+        return card_key(card_or_key)
+    # S3764 / G1332 are stored as uid:3764_skater / uid:1332_goalie when the card has a unique_id
+    match = re.fullmatch(r'([SG])(\d+)', card_or_key)
+    if match:
+        uid_key = f"uid:{match.group(2)}_{'goalie' if match.group(1) == 'G' else 'skater'}"
+        if conn.execute('SELECT 1 FROM latest WHERE card_key = ?', (uid_key,)).fetchone():
+            return uid_key
+    return card_or_key
+
+
+class CardHistory:
+    """Delta history of every card. Like CardStore, each call opens its own connection."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def record(self, cards: Iterable[Dict], ts: float = None) -> int:
+        """Store what changed in each card since its last recorded state, in one transaction.
+        Timestamps per card must not go backwards. Returns the number of rows written."""
+        ts = time.time() if ts is None else ts
+        written = 0
+        conn = self._connect()
+        try:
+            with conn:
+                # Take the write lock before reading `latest`, so two writers never both
+                # store deltas against the same previous state
+                conn.execute('BEGIN IMMEDIATE')
+                for card in cards:
+                    key = card_key(card)
+                    row = conn.execute('SELECT ts, data FROM latest WHERE card_key = ?', (key,)).fetchone()
+                    if row is None:
+                        delta, base = {'set': card}, 1
+                    else:
+                        if ts < row[0]:
+                            continue
+                        delta, base = make_card_delta(json.loads(row[1]), card), 0
+                        if not delta['set'] and not delta.get('unset'):
+                            continue
+                    text = json.dumps(delta, ensure_ascii=False)
+                    conn.execute('INSERT INTO history (card_key, ts, base, delta) VALUES (?, ?, ?, ?)',
+                                 (key, ts, base, text))
+                    conn.execute('INSERT OR REPLACE INTO latest (card_key, ts, data) VALUES (?, ?, ?)',
+                                 (key, ts, json.dumps(card, ensure_ascii=False)))
+                    written += 1
+        finally:
+            conn.close()
+        return written
+
+    def _rows(self, conn, key: str, at: float = None) -> List[tuple]:
+
+        # Start from the newest base row at or before `at`, so the fold stays short
+        at = float('inf') if at is None else at
+        start = conn.execute('SELECT MAX(id) FROM history WHERE card_key = ? AND base = 1 AND ts <= ?',
+                             (key, at)).fetchone()[0]
+        if start is None:
+            return []
+        return conn.execute('SELECT ts, base, delta FROM history WHERE card_key = ? AND id >= ? AND ts <= ? '
+                            'ORDER BY id', (key, start, at)).fetchall()
+
+    def state_as_of(self, card_or_key, at: float) -> Optional[Dict]:
+        """The card as it was at unix time `at` (None if it was not known yet)"""
+        conn = self._connect()
+        try:
+            state = None
+            for _, base, delta in self._rows(conn, _key(conn, card_or_key), at):
+                state = _apply(state, json.loads(delta), base)
+            return state
+        finally:
+            conn.close()
+
+    def catalog_as_of(self, at: float) -> List[Dict]:
+        """Every card known at `at`, in first-seen order"""
+        conn = self._connect()
+        try:
+            keys = [key for (key,) in conn.execute(
+                'SELECT card_key FROM history WHERE ts <= ? GROUP BY card_key ORDER BY MIN(id)', (at,))]
+        finally:
+            conn.close()
+        return [state for state in (self.state_as_of(key, at) for key in keys) if state is not None]
+
+    def field_history(self, card_or_key, field: str) -> List[tuple]:
+        """[(ts, value)] each time `field` got a new value (None when it was removed)"""
+        conn = self._connect()
+        try:
+            rows = self._rows(conn, _key(conn, card_or_key))
+        finally:
+            conn.close()
+        changes, state = [], None
+        for ts, base, delta in rows:
+            state_before = state
+            state = _apply(state, json.loads(delta), base)
+            value = state.get(field)
+            if state_before is None or state_before.get(field) != value:
+                changes.append((ts, value))
+        return changes
+
+    def compact(self, keep_days: float = KEEP_DAYS) -> int:
+        """Fold each card's rows older than keep_days into one base row; returns rows removed"""
+        cutoff = time.time() - keep_days * 86400
+        removed = 0
+        conn = self._connect()
+        try:
+            with conn:
+                keys = [key for (key,) in conn.execute(
+                    'SELECT card_key FROM history WHERE ts < ? GROUP BY card_key HAVING COUNT(*) > 1', (cutoff,))]
+                for key in keys:
+                    rows = conn.execute('SELECT id, ts, base, delta FROM history WHERE card_key = ? AND ts < ? '
+                                        'ORDER BY id', (key, cutoff)).fetchall()
+                    state = None
+                    for _, _, base, delta in rows:
+                        state = _apply(state, json.loads(delta), base)
+                    # Fold into the oldest row in place: a new row would get a higher id than
+                    # the deltas recorded after the cutoff, and _rows() replays in id order
+                    conn.execute('UPDATE history SET ts = ?, base = 1, delta = ? WHERE id = ?',
+                                 (rows[-1][1], json.dumps({'set': state}, ensure_ascii=False), rows[0][0]))
+                    conn.execute(f"DELETE FROM history WHERE id IN ({','.join('?' * (len(rows) - 1))})",
+                                 [row[0] for row in rows[1:]])
+                    removed += len(rows) - 1
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+        return removed
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        try:
+            rows, cards = conn.execute('SELECT COUNT(*), COUNT(DISTINCT card_key) FROM history').fetchone()
+        finally:
+            conn.close()
+        return {'rows': rows, 'cards': cards, 'bytes': os.path.getsize(self.path)}
+
+
+def _legacy_backups(directory: str) -> List[tuple]:
+
+    # master_backup_<unix seconds>.json full copies written by older monitor versions
+    found = []
+    for path in glob.glob(os.path.join(directory, 'master_backup_*.json')):
+        match = re.search(r'master_backup_(\d+)\.json$', path)
+        if match:
+            found.append((float(match.group(1)), path))
+    return sorted(found)
+
+
+def seed(history: CardHistory, master_path: str = 'master.json') -> int:
+    """Record every known past state in time order: legacy master_backup_*.json copies,
+    the utils_backup chain and finally the current master data. Run on an empty history."""
+    # utils_changelog records into this module, so it is imported here, not at the top
+    from utils_changelog import load_master
+
+    directory = os.path.dirname(os.path.abspath(master_path))
+    points = [(ts, path, None) for ts, path in _legacy_backups(directory)]
+    points += [(ms / 1000, None, data) for ms, data in
+               MasterBackups(os.path.join(directory, DEFAULT_BACKUP_DIR)).iter_states()]
+    points.sort(key=lambda point: point[0])
+
+    written = 0
+    for ts, path, data in points:
+        if path:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        written += history.record(data.get('players', []), ts)
+    written += history.record(load_master(master_path).get('players', []))
+    return written
+
+
+def _parse_time(text: str) -> float:
+
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    return float(text)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Query or maintain the per-card stat history')
+    ap.add_argument('command', choices=['seed', 'show', 'asof', 'compact', 'stats'])
+    ap.add_argument('card', nargs='?', help='Card key, e.g. S3764, G1332, uid:3764_skater or url:<card url>')
+    ap.add_argument('--db', default=DEFAULT_HISTORY_PATH, help='History database (default: card_history.db)')
+    ap.add_argument('--master', default='master.json', help='seed: master data path (default: master.json)')
+    ap.add_argument('--field', default='overall', help='show: field to trace (default: overall)')
+    ap.add_argument('--at', help='asof: YYYY-MM-DD[ HH:MM[:SS]] or unix time')
+    ap.add_argument('--keep-days', type=float, default=KEEP_DAYS, help='compact: keep full detail this long')
+    args = ap.parse_args()
+
+    history = CardHistory(args.db)
+    if args.command == 'seed':
+        print(f"Recorded {seed(history, args.master)} history rows")
+    elif args.command == 'compact':
+        print(f"Folded away {history.compact(args.keep_days)} rows")
+    elif args.command == 'stats':
+        stats = history.stats()
+        print(f"{args.db}: {stats['rows']} rows for {stats['cards']} cards, {stats['bytes']} B")
+    elif not args.card:
+        print(f"Failed: {args.command} needs a card key")
+        return 1
+    elif args.command == 'show':
+        for ts, value in history.field_history(args.card, args.field):
+            print(f"{datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')}  {args.field} = {value}")
+    else:
+        try:
+            at = _parse_time(args.at) if args.at else time.time()
+        except ValueError as e:
+            print(f"Failed: {e}")
+            return 1
+        state = history.state_as_of(args.card, at)
+        if state is None:
+            print(f"Failed: {args.card} not known at that time")
+            return 1
+        print(json.dumps(state, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
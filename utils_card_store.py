@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+SQLite card store
+Korttikatalogi SQLite-tietokannassa: indeksoidut haut, transaktionaaliset lisäykset
+ilman koko master.json:n uudelleenkirjoitusta, ja JSON-vienti yhteensopivuutta varten.
+master.json (+ muutosloki) on ensisijainen lähde; master.db synkronoidaan siitä.
+Synkronointi kirjoittaa vain muuttuneet kortit ja poistaa kadonneet, eikä tee mitään, kun
+kumpikaan tiedosto ei ole muuttunut. Indeksit: unique_id, player_id, nationality, team,
+position ja overall. Vienti kirjoittaa master.json:n utils_backup.write_masterin kautta.
+
+Usage:
+    python utils_card_store.py import master.json      # create/refresh master.db from JSON
+    python utils_card_store.py sync master.json        # bring master.db up to date with master.json + change log
+    python utils_card_store.py export master.json      # write master.json from master.db
+    python utils_card_store.py stats
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from utils_writer_lock import WriterLock
+
+DEFAULT_DB_PATH = 'master.db'
+
+# Indexed columns copied out of each card; the full card is kept as JSON in `data`
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    card_key    TEXT NOT NULL UNIQUE,
+    unique_id   TEXT,
+    player_id   INTEGER,
+    is_goalie   INTEGER NOT NULL DEFAULT 0,
+    url         TEXT,
+    nationality TEXT,
+    team        TEXT,
+    position    TEXT,
+    overall     INTEGER,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cards_unique_id ON cards(unique_id);
+CREATE INDEX IF NOT EXISTS idx_cards_player_id ON cards(player_id, is_goalie);
+CREATE INDEX IF NOT EXISTS idx_cards_url ON cards(url);
+CREATE INDEX IF NOT EXISTS idx_cards_nationality ON cards(nationality);
+CREATE INDEX IF NOT EXISTS idx_cards_team ON cards(team);
+CREATE INDEX IF NOT EXISTS idx_cards_position ON cards(position);
+CREATE INDEX IF NOT EXISTS idx_cards_overall ON cards(overall);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_UPSERT = """
+INSERT INTO cards (card_key, unique_id, player_id, is_goalie, url, nationality, team, position, overall, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(card_key) DO UPDATE SET
+    unique_id = excluded.unique_id, player_id = excluded.player_id, is_goalie = excluded.is_goalie,
+    url = excluded.url, nationality = excluded.nationality, team = excluded.team,
+    position = excluded.position, overall = excluded.overall, data = excluded.data
+"""
+
+
+def card_key(card: Dict) -> str:
+    """Stable identity of a card: unique_id, else player_id + goalie flag, else URL"""
+    if card.get('unique_id'):
+        return f"uid:{card['unique_id']}"
+    if card.get('player_id') is not None:
+        return f"{'G' if card.get('is_goalie') else 'S'}{card['player_id']}"
+    return f"url:{card.get('url', '')}"
+
+
+def _file_signature(path: str) -> Optional[list]:
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _as_int(value) -> Optional[int]:
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(card: Dict) -> tuple:
+
+    return (
+        card_key(card),
+        card.get('unique_id'),
+        _as_int(card.get('player_id')),
+        1 if card.get('is_goalie') else 0,
+        card.get('url'),
+        card.get('nationality'),
+        card.get('team'),
+        card.get('position'),
+        _as_int(card.get('overall')),
+        json.dumps(card, ensure_ascii=False),
+    )
+
+
+class CardStore:
+    """Card catalog in SQLite. Each call opens its own connection, so one store can be
+    shared by the GUI and monitor threads, and several processes can use the same file."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, history=None):
+        self.path = path
+        # Optional utils_card_history.CardHistory that records every upsert
+        self.history = history
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def upsert_cards(self, cards: Iterable[Dict]) -> int:
+        """Insert or replace cards in one transaction; returns the number of cards written"""
+        cards = list(cards)
+        rows = [_row(card) for card in cards]
+        if not rows:
+            return 0
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(_UPSERT, rows)
+        finally:
+            conn.close()
+        if self.history is not None:
+            self.history.record(cards)
+        return len(rows)
+
+    def count(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM cards').fetchone()[0]
+        finally:
+            conn.close()
+
+    def _select(self, where: str = '', params: tuple = ()) -> List[Dict]:
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(f'SELECT data FROM cards {where} ORDER BY seq', params)
+            return [json.loads(data) for (data,) in cursor]
+        finally:
+            conn.close()
+
+    def players(self) -> List[Dict]:
+        """All cards in insertion order (same order master.json had)"""
+        return self._select()
+
+    def get(self, card: Dict) -> Optional[Dict]:
+        """Stored card with the same identity as `card`, if any"""
+        found = self._select('WHERE card_key = ?', (card_key(card),))
+        return found[0] if found else None
+
+    def find(self, nationality: str = None, team: str = None, position: str = None,
+             min_overall: int = None, player_id: int = None, is_goalie: bool = None) -> List[Dict]:
+        """Indexed lookup; every given filter must match"""
+        clauses, params = [], []
+        for column, value in (('nationality', nationality), ('team', team), ('position', position),
+                              ('player_id', player_id)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if is_goalie is not None:
+            clauses.append('is_goalie = ?')
+            params.append(1 if is_goalie else 0)
+        if min_overall is not None:
+            clauses.append('overall >= ?')
+            params.append(min_overall)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._select(where, tuple(params))
+
+    def urls(self) -> set:
+        conn = self._connect()
+        try:
+            return {url for (url,) in conn.execute('SELECT url FROM cards WHERE url IS NOT NULL')}
+        finally:
+            conn.close()
+
+    def iter_players(self) -> Iterator[Dict]:
+        """Stream cards in insertion order without building the full list"""
+        conn = self._connect()
+        try:
+            for (data,) in conn.execute('SELECT data FROM cards ORDER BY seq'):
+                yield json.loads(data)
+        finally:
+            conn.close()
+
+    def import_json(self, path: str = 'master.json') -> int:
+        with open(path, 'r', encoding='utf-8') as f:
+            players = json.load(f).get('players', [])
+        return self.upsert_cards(players)
+
+    def sync_from_json(self, path: str = 'master.json') -> int:
+        """Make the store match master.json plus its change log, the authoritative copy that
+        every monitor writes. Skipped while neither file changed since the last sync; otherwise
+        only differing cards are written and cards gone from master.json are deleted.
+        History is not recorded here: the writers already record it. Returns cards written."""
+        # utils_changelog imports this module, so it is imported here, not at the top
+        from utils_changelog import default_log_path, load_master
+
+        # Signature taken before the read, so a write landing meanwhile triggers the next sync
+        source = json.dumps([_file_signature(path), _file_signature(default_log_path(path))])
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            if row and row[0] == source:
+                return 0
+            players = load_master(path).get('players', [])
+            stored = dict(conn.execute('SELECT card_key, data FROM cards'))
+            rows = [_row(card) for card in players]
+            changed = [r for r in rows if stored.get(r[0]) != r[-1]]
+            removed = set(stored) - {r[0] for r in rows}
+            with conn:
+                conn.executemany(_UPSERT, changed)
+                conn.executemany('DELETE FROM cards WHERE card_key = ?', [(key,) for key in removed])
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (source,))
+        finally:
+            conn.close()
+        return len(changed)
+
+    def export_json(self, path: str = 'master.json') -> int:
+        """Write {"players": [...]} to path through utils_backup.write_master: a backup step,
+        an atomic replace and a snapshot refresh, like every other master.json write"""
+        # utils_backup imports card_key from this module, so it is imported here, not at the top
+        from utils_backup import write_master
+
+        players = list(self.iter_players())
+        write_master({'players': players}, path)
+        return len(players)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Manage the SQLite card store (master.db)')
+    ap.add_argument('command', choices=['import', 'sync', 'export', 'stats'])
+    ap.add_argument('json_path', nargs='?', default='master.json')
+    ap.add_argument('--db', default=DEFAULT_DB_PATH, help='Database path (default: master.db)')
+    args = ap.parse_args()
+
+    store = CardStore(args.db)
+    if args.command == 'import':
+        count = store.import_json(args.json_path)
+        print(f"Imported {count} cards from {args.json_path} into {args.db}")
+    elif args.command == 'sync':
+        count = store.sync_from_json(args.json_path)
+        print(f"Synced {args.db} with {args.json_path}: {count} cards written, {store.count()} in total")
+    elif args.command == 'export':
+        # Monitors may be writing the same file; wait for the writer lock
+        with WriterLock(args.json_path):
+            count = store.export_json(args.json_path)
+        print(f"Exported {count} cards from {args.db} to {args.json_path}")
+    else:
+        print(f"{args.db}: {store.count()} cards")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Append-only change log for master data
+Korttien lisäykset kirjoitetaan NDJSON-lokiin master.json:n uudelleenkirjoituksen sijaan.
+Lukijat toistavat lokin viimeisimmän snapshotin päälle, ja tiivistys yhdistää lokin
+säännöllisesti uudeksi snapshotiksi. Loki toimii samalla muutossyötteenä.
+Automaattinen monitori kirjoittaa uudet kortit lokiin, ja tiivistys käynnistyy taustalla,
+kun COMPACT_EVERY muutosta odottaa.
+
+Usage:
+    python utils_changelog.py compact            # fold master.changes.ndjson into master.json
+    python utils_changelog.py feed --since 120   # print changes after seq 120
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+from utils_backup import write_master
+from utils_card_history import CardHistory, history_path_for
+from utils_card_store import card_key
+from utils_merge import merge_cards
+from utils_snapshot import load_master_json
+from utils_writer_lock import WriterLock
+
+# Compact once this many changes are waiting in the log
+COMPACT_EVERY = 200
+
+
+def default_log_path(snapshot_path: str) -> str:
+    root, _ = os.path.splitext(snapshot_path)
+    return f'{root}.changes.ndjson'
+
+
+class MasterChangeLog:
+    """master.json snapshot plus an NDJSON log of card upserts.
+
+    Log lines are {"seq", "ts", "op": "upsert", "card"}. After compaction the log
+    starts with a {"compacted_through": seq} header, so seq keeps growing and feed
+    consumers can resume from the last seq they saw.
+    """
+
+    def __init__(self, snapshot_path: str = 'master.json', log_path: str = None,
+                 compact_every: int = COMPACT_EVERY, history: CardHistory = None):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or default_log_path(snapshot_path)
+        self.compact_every = compact_every
+        # Field-level history of every card written through this log; opened on first write
+        # so read-only users (load_master) never create card_history.db
+        self._history = history
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._seq = None
+        self._seq_signature = None
+
+    def _read_log(self):
+
+        # -> (compacted_through, [entries]); a torn last line from a crash is ignored
+        through, entries = 0, []
+        try:
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    entry = json.loads(line)
+                    if 'compacted_through' in entry:
+                        through = entry['compacted_through']
+                    else:
+                        entries.append(entry)
+        except FileNotFoundError:
+            pass
+        return through, entries
+
+    def last_seq(self) -> int:
+        through, entries = self._read_log()
+        return entries[-1]['seq'] if entries else through
+
+    def pending(self) -> int:
+        """Changes not yet folded into the snapshot"""
+        return len(self._read_log()[1])
+
+    @property
+    def history(self) -> CardHistory:
+        if self._history is None:
+            self._history = CardHistory(history_path_for(self.snapshot_path))
+        return self._history
+
+    def _log_signature(self) -> Optional[tuple]:
+
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def append(self, cards: Iterable[Dict], op: str = 'upsert') -> int:
+        """Append card upserts and fsync under the writer lock; cost is O(new cards).
+        Returns the last seq written."""
+        cards = list(cards)
+        with self._lock, WriterLock(self.snapshot_path):
+            # Another process may have appended or compacted since our last write
+            if self._seq is None or self._seq_signature != self._log_signature():
+                self._seq = self.last_seq()
+            seq = self._seq
+            now = time.time()
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                for card in cards:
+                    seq += 1
+                    f.write(json.dumps({'seq': seq, 'ts': now, 'op': op, 'card': card}, ensure_ascii=False))
+                    f.write('\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._seq = seq
+            self._seq_signature = self._log_signature()
+            self._record_history(cards)
+        return seq
+
+    def _record_history(self, cards) -> None:
+
+        # Under the writer lock, so history rows follow the order of the writes
+        try:
+            self.history.record(cards)
+        except sqlite3.Error:
+            # The write itself is already on disk. A failed record rolls back `latest` too, so
+            # the card's next record stores the whole difference; only the timestamp is lost
+            pass
+
+    def iter_changes(self, since_seq: int = 0) -> Iterator[Dict]:
+        """Change feed: log entries with seq > since_seq, oldest first"""
+        through, entries = self._read_log()
+        if since_seq < through:
+            # Older entries were compacted away; the consumer has to resync from the snapshot
+            raise ValueError(f"changes up to seq {through} were compacted, resync from {self.snapshot_path}")
+        for entry in entries:
+            if entry['seq'] > since_seq:
+                yield entry
+
+    @staticmethod
+    def _replay(data: Dict, entries) -> Dict:
+
+        players = data.setdefault('players', [])
+        index = {card_key(p): i for i, p in enumerate(players)}
+        for entry in entries:
+            card = entry['card']
+            key = card_key(card)
+            if key in index:
+                players[index[key]] = card
+            else:
+                index[key] = len(players)
+                players.append(card)
+        return data
+
+    def load(self) -> Dict:
+        """Snapshot with every logged change applied, as {"players": [...]}"""
+        data = load_master_json(self.snapshot_path)
+        return self._replay(data, self._read_log()[1])
+
+    def _fold(self, cards: Iterable[Dict] = ()) -> tuple:
+
+        # Under the writer lock: snapshot + log + cards -> new snapshot, log reset to a header
+        with WriterLock(self.snapshot_path):
+            data = load_master_json(self.snapshot_path)
+            # Shallow copy of the on-disk state for the backup delta: replay and merge replace
+            # cards in the list, they never modify them
+            old = dict(data, players=list(data.get('players', [])))
+            through, entries = self._read_log()
+            self._replay(data, entries)
+            result = merge_cards(data['players'], cards)
+            if not entries and not result.changed:
+                return result, data, 0
+            # Atomic replace plus a compressed delta backup of the previous snapshot
+            write_master(data, self.snapshot_path, old=old)
+            if result.changed:
+                self._record_history(result.changed)
+            if entries:
+                tmp_path = f'{self.log_path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({'compacted_through': entries[-1]['seq']}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.log_path)
+            return result, data, len(entries)
+
+    def compact(self) -> int:
+        """Fold logged changes into a new snapshot; returns the number of changes folded.
+        Appends from other threads and processes wait on the writer lock meanwhile."""
+        return self._fold()[2]
+
+    def commit_cards(self, cards: Iterable[Dict]) -> tuple:
+        """Merge cards into the latest on-disk master data (snapshot + log) and write a new
+        snapshot, all under the writer lock. For writers that rewrite master.json instead of
+        appending: cards written meanwhile by other processes are kept.
+
+        Returns (MergeResult, data written).
+        """
+        result, data, _ = self._fold(cards)
+        return result, data
+
+    def compact_in_background(self, on_done=None) -> Optional[threading.Thread]:
+        """Start compact() in a daemon thread unless one is already running"""
+        if self._compacting:
+            return None
+        self._compacting = True
+
+        def run():
+            try:
+                folded = self.compact()
+                if on_done:
+                    on_done(folded, None)
+            except Exception as e:
+                if on_done:
+                    on_done(0, e)
+            finally:
+                self._compacting = False
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def maybe_compact(self, on_done=None) -> Optional[threading.Thread]:
+        """Compact in the background once compact_every changes are pending"""
+        if self.pending() >= self.compact_every:
+            return self.compact_in_background(on_done)
+        return None
+
+
+def load_master(snapshot_path: str = 'master.json') -> Dict:
+    """master.json with any pending change-log entries applied"""
+    return MasterChangeLog(snapshot_path).load()
+
+
+def commit_cards(cards: Iterable[Dict], snapshot_path: str = 'master.json') -> tuple:
+    """Locked read-merge-write of cards into master.json; see MasterChangeLog.commit_cards"""
+    return MasterChangeLog(snapshot_path).commit_cards(cards)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Compact or read the master.json change log')
+    ap.add_argument('command', choices=['compact', 'feed', 'stats'])
+    ap.add_argument('--master', default='master.json', help='Snapshot path (default: master.json)')
+    ap.add_argument('--since', type=int, default=0, help='feed: print changes after this seq')
+    args = ap.parse_args()
+
+    log = MasterChangeLog(args.master)
+    if args.command == 'compact':
+        print(f"Folded {log.compact()} changes into {args.master}")
+    elif args.command == 'feed':
+        try:
+            for entry in log.iter_changes(args.since):
+                print(json.dumps(entry, ensure_ascii=False))
+        except ValueError as e:
+            print(f"Failed: {e}")
+            return 1
+    else:
+        print(f"{log.log_path}: {log.pending()} pending changes, last seq {log.last_seq()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,90 @@
+import html as html_lib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from html.entities import html5 as _HTML5_ENTITIES
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
 
+# Fragment fast path: DataTables cells are short, well-formed snippets like
+# <a id="123" href="?id=123">NAME</a> or <img src="...">. These are tokenized with
+# regexes; anything unusual (comments, scripts, stray '<', odd entities) goes to BeautifulSoup.
+_TAG_RE = re.compile(r"""<(/?)([A-Za-z][\w:.-]*)((?:[^<>"']+|"[^"]*"|'[^']*')*)>""")
+_ATTR_RE = re.compile(r"""([^\s"'<>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?""")
+_ENTITY_RE = re.compile(r'&(#[0-9]+;|#[xX][0-9a-fA-F]+;|[A-Za-z][A-Za-z0-9]*;)?')
+_RAW_TEXT_TAGS = {'script', 'style', 'textarea', 'title', 'xmp', 'iframe', 'noembed', 'noframes', 'plaintext'}
+
+def _entities_are_simple(text: str) -> bool:
+
+    for m in _ENTITY_RE.finditer(text):
+        ref = m.group(1)
+        if ref is None:
+            return False
+        if ref[0] == '#':
+            code = int(ref[2:-1], 16) if ref[1] in 'xX' else int(ref[1:-1])
+            if not (0x20 <= code <= 0x7e or 0xa0 <= code <= 0xd7ff or 0xe000 <= code <= 0x10ffff):
+                return False
+        elif ref not in _HTML5_ENTITIES:
+            return False
+    return True
+
+def _split_fragment(html: str):
+
+    # Returns (texts, tags) or None if the fragment needs the real parser.
+    # tags is a list of (lowercase name, raw attribute string) for opening tags.
+    if '<' in html:
+        parts = _TAG_RE.split(html)
+        texts = parts[::4]
+        for text in texts:
+            if '<' in text:
+                return None
+        tags = []
+        for closing, name, raw in zip(parts[1::4], parts[2::4], parts[3::4]):
+            name = name.lower()
+            if name in _RAW_TEXT_TAGS:
+                return None
+            if not closing:
+                tags.append((name, raw))
+    else:
+        texts = [html]
+        tags = []
+    if '&' in html:
+        for text in texts:
+            if '&' in text and not _entities_are_simple(text):
+                return None
+    return texts, tags
+
+def _tag_attrs(raw: str) -> dict:
+
+    attrs = {}
+    for m in _ATTR_RE.finditer(raw):
+        value = m.group(2)
+        if value is None:
+            value = m.group(3)
+        if value is None:
+            value = m.group(4)
+        # html.parser lowercases names and keeps the last duplicate
+        attrs[m.group(1).lower()] = html_lib.unescape(value) if value else ''
+    return attrs
+
 def extract_text(html: str) -> str:
 
     if html is None:
         return ''
     if not isinstance(html, str):
         return str(html)
+    if '<' not in html and '&' not in html:
+        return html.strip()
+    parts = _split_fragment(html)
+    if parts is not None:
+        out = []
+        for text in parts[0]:
+            if '&' in text:
+                text = html_lib.unescape(text)
+            text = text.strip()
+            if text:
+                out.append(text)
+        return ''.join(out)
     soup = BeautifulSoup(html, 'html.parser')
     return soup.get_text(strip=True)
 
@@ -14,6 +92,12 @@ def extract_img_src(html: str) -> str:
 
     if not isinstance(html, str):
         return ''
+    parts = _split_fragment(html)
+    if parts is not None:
+        for name, raw in parts[1]:
+            if name == 'img':
+                return _tag_attrs(raw).get('src') or ''
+        return ''
     soup = BeautifulSoup(html, 'html.parser')
     img = soup.find('img')
     if img and img.get('src'):
@@ -119,91 +203,165 @@ def parse_salary_number(text: str):
         return int(round(base * 1_000))
     return int(round(base))
 
-def clean_common_fields(row: dict) -> dict:
+def extract_player_id_from_html(html: str):
 
-    cleaned = {k: v for k, v in row.items() if isinstance(k, str) and k.strip() != ''}
-
-    # Extract player_id from HTML before stripping
-    def extract_player_id_from_html(html: str):
-        if not isinstance(html, str) or not html:
-            return None
+    # Player id from the first <a>: numeric id attribute or ?id= in href
+    if not isinstance(html, str) or not html:
+        return None
+    a = None
+    parts = _split_fragment(html)
+    if parts is not None:
+        for name, raw in parts[1]:
+            if name == 'a':
+                a = _tag_attrs(raw)
+                break
+    else:
         soup = BeautifulSoup(html, 'html.parser')
-        # a tag with numeric id attribute
         a = soup.find('a')
-        if a is not None:
-            aid = a.get('id')
-            if aid and aid.isdigit():
-                try:
-                    return int(aid)
-                except Exception:
-                    pass
-            href = a.get('href')
-            if href:
-                try:
-                    q = urlparse(href)
-                    params = parse_qs(q.query)
-                    if 'id' in params:
-                        val = params['id'][0]
-                        if val.isdigit():
-                            return int(val)
-                    # href may be just '?id=1234'
-                    if href.startswith('?'):
-                        params = parse_qs(href[1:])
-                        val = params.get('id', [None])[0]
-                        if val and val.isdigit():
-                            return int(val)
-                except Exception:
-                    pass
-        return None
+    # a tag with numeric id attribute
+    if a is not None:
+        aid = a.get('id')
+        if aid and aid.isdigit():
+            try:
+                return int(aid)
+            except Exception:
+                pass
+        href = a.get('href')
+        if href:
+            try:
+                q = urlparse(href)
+                params = parse_qs(q.query)
+                if 'id' in params:
+                    val = params['id'][0]
+                    if val.isdigit():
+                        return int(val)
+                # href may be just '?id=1234'
+                if href.startswith('?'):
+                    params = parse_qs(href[1:])
+                    val = params.get('id', [None])[0]
+                    if val and val.isdigit():
+                        return int(val)
+            except Exception:
+                pass
+    return None
+
+# Fields that are floats
+FLOAT_FIELDS = {'aOVR', 'starting_average_overall', 'starting_adjusted_overall'}
+# Low-cardinality HTML fields that clean_rows memoizes (full_name/card_art are unique per card)
+MEMO_TEXT_FIELDS = {'team', 'league', 'division', 'nationality', 'position', 'hand', 'card'}
 
+def _normalize_units(text: str) -> str:
+
+    return text.replace('\u00a0', ' ').replace('  ', ' ').strip()
+
+def _clean_weight(raw):
+
+    # -> (weight value for the row, weight_kg or None)
+    text = _normalize_units(extract_text(raw))
+    kg = parse_weight_kg(text)
+    return (kg, kg) if kg is not None else (text, None)
+
+def _clean_height(raw):
+
+    text = _normalize_units(extract_text(raw))
+    cm = parse_height_cm(text)
+    return (cm, cm) if cm is not None else (text, None)
+
+def _clean_salary(raw):
+
+    text = extract_text(raw)
+    num = parse_salary_number(text)
+    return (num, num) if num is not None else (text, None)
+
+def _memo_get(memo, field, raw, fn):
+
+    if memo is None:
+        return fn(raw)
+    cache = memo.get(field)
+    if cache is None:
+        cache = memo[field] = {}
+    try:
+        return cache[raw]
+    except KeyError:
+        value = cache[raw] = fn(raw)
+        return value
+    except TypeError:
+        # Unhashable cell value, nothing to memoize
+        return fn(raw)
+
+def _clean_row(row: dict, memo) -> dict:
+
+    cleaned = {k: v for k, v in row.items() if isinstance(k, str) and k.strip() != ''}
+
+    # Extract player_id from HTML before stripping
     pid = extract_player_id_from_html(row.get('full_name', '')) or extract_player_id_from_html(row.get('card_art', ''))
     if pid is not None:
         cleaned['player_id'] = pid
     # Strip HTML from known fields
-    for key in ['full_name', 'team', 'league', 'division', 'nationality', 'position', 'hand', 'height', 'weight', 'salary', 'card']:
+    for key in ('full_name', 'team', 'league', 'division', 'nationality', 'position', 'hand', 'card'):
         if key in cleaned:
-            cleaned[key] = extract_text(cleaned[key])
+            if key in MEMO_TEXT_FIELDS:
+                cleaned[key] = _memo_get(memo, key, cleaned[key], extract_text)
+            else:
+                cleaned[key] = extract_text(cleaned[key])
     # Card art -> image src only
     if 'card_art' in cleaned:
         cleaned['card_art'] = extract_img_src(cleaned['card_art'])
-    # Normalize weight/height units spacing
-    if 'weight' in cleaned:
-        cleaned['weight'] = cleaned['weight'].replace('\u00a0', ' ').replace('  ', ' ').strip()
-    if 'height' in cleaned:
-        cleaned['height'] = cleaned['height'].replace('\u00a0', ' ').replace('  ', ' ').strip()
-    # EU units - store numeric in primary fields
-    kg = parse_weight_kg(cleaned.get('weight', ''))
-    if kg is not None:
-        cleaned['weight_kg'] = kg
-        cleaned['weight'] = kg
-    cm = parse_height_cm(cleaned.get('height', ''))
-    if cm is not None:
-        cleaned['height_cm'] = cm
-        cleaned['height'] = cm
-    # Salary number
-    salary_num = parse_salary_number(cleaned.get('salary', ''))
-    if salary_num is not None:
-        cleaned['salary'] = salary_num
-        cleaned['salary_number'] = salary_num
+    # EU units - store numeric in primary fields, normalizing unit spacing first
+    extras = []
+    for key, mirror, fn in (('weight', 'weight_kg', _clean_weight),
+                            ('height', 'height_cm', _clean_height),
+                            ('salary', 'salary_number', _clean_salary)):
+        if key in cleaned:
+            value, number = _memo_get(memo, key, cleaned[key], fn)
+            cleaned[key] = value
+            if number is not None:
+                extras.append((mirror, number))
+    for mirror, number in extras:
+        cleaned[mirror] = number
 
     # Coerce other numeric-looking fields to numbers
-    def try_int(v):
-        if isinstance(v, str) and v.isdigit():
+    for k, v in cleaned.items():
+        if k in FLOAT_FIELDS:
             try:
-                return int(v)
+                cleaned[k] = float(v)
             except Exception:
-                return v
-        return v
-
-    # Fields that are floats
-    float_fields = {'aOVR', 'starting_average_overall', 'starting_adjusted_overall'}
-    for k, v in list(cleaned.items()):
-        if k in float_fields:
+                pass
+        elif isinstance(v, str) and v.isdigit():
             try:
-                cleaned[k] = float(v)
+                cleaned[k] = int(v)
             except Exception:
                 pass
-        else:
-            cleaned[k] = try_int(v)
     return cleaned
 
+def clean_common_fields(row: dict) -> dict:
+
+    return _clean_row(row, None)
+
+def clean_rows(rows, memo: dict = None) -> list:
+
+    # Batch cleaning: fragment -> cleaned value and height/weight/salary string -> number
+    # are memoized per field. Pass the same memo dict across pages to keep reusing it.
+    if memo is None:
+        memo = {}
+    return [_clean_row(row, memo) for row in rows]
+
+# Below this many rows the process pool start-up costs more than it saves
+PARALLEL_MIN_ROWS = 5000
+
+def clean_rows_parallel(rows, workers: int = None, chunk_size: int = 2000) -> list:
+
+    # Chunked multi-process cleaning for large exports. Output order matches input order.
+    # Each worker memoizes within its own chunk. Falls back to clean_rows for small inputs.
+    rows = list(rows)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(rows) < PARALLEL_MIN_ROWS:
+        return clean_rows(rows)
+    chunk_size = max(1, chunk_size)
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    cleaned = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        # map() yields results in submission order, so chunks are reassembled deterministically
+        for chunk in executor.map(clean_rows, chunks):
+            cleaned.extend(chunk)
+    return cleaned
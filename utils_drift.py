@@ -0,0 +1,110 @@
+"""
+Layout drift detection
+Tarkistaa ennen hakua, että korttisivujen jäsennin tuottaa edelleen pakolliset kentät,
+ja seuraa kenttäkohtaista kattavuutta haun aikana
+"""
+
+from typing import Callable, Dict, List, Optional
+
+# Long-lived cards whose pages should always parse completely
+CANARY_URLS = [
+    'https://nhlhutbuilder.com/player-stats.php?id=3764',  # COREY PERRY, skater
+    'https://nhlhutbuilder.com/goalie-stats.php?id=1338',  # MARTIN BRODEUR, goalie
+]
+
+_COMMON_FIELDS = {
+    'overall': int,
+    'card': str,
+    'nationality': str,
+    'hand': str,
+    'weight': int,
+    'height': int,
+    'salary': int,
+}
+
+# field -> expected type after extract_player_stats
+REQUIRED_FIELDS = {
+    False: dict(_COMMON_FIELDS, position=str, acceleration=int, speed=int, passing=int,
+                puck_control=int, def_awareness=int),
+    True: dict(_COMMON_FIELDS, glove_high=int, glove_low=int, stick_high=int,
+               stick_low=int, positioning=int),
+}
+
+# Coverage below this share of crawled cards is reported as drift
+COVERAGE_WARN_RATIO = 0.9
+
+
+def invalid_required_fields(card: Optional[Dict], is_goalie: bool) -> List[str]:
+    """Return required fields that are missing, empty or of the wrong type"""
+    required = REQUIRED_FIELDS[bool(is_goalie)]
+    if not card:
+        return sorted(required) + ['name']
+    problems = []
+    for field, expected_type in required.items():
+        value = card.get(field)
+        if value is None or value == '' or not isinstance(value, expected_type) or isinstance(value, bool):
+            problems.append(field)
+    # fetch_card_details falls back to "Player <id>" when no name was found
+    name = card.get('name') or ''
+    if not name or name == f"Player {card.get('player_id')}":
+        problems.append('name')
+    return problems
+
+
+def preflight_check(fetch_card: Callable[[str], Optional[Dict]], canary_urls: List[str] = None) -> Dict[str, List[str]]:
+    """Parse canary pages through fetch_card; returns {url: invalid fields} for failing pages"""
+    failures = {}
+    for url in canary_urls or CANARY_URLS:
+        is_goalie = 'goalie' in url.lower()
+        problems = invalid_required_fields(fetch_card(url), is_goalie)
+        if problems:
+            failures[url] = problems
+    return failures
+
+
+class FieldCoverage:
+    """Running per-field extraction coverage for cards parsed during a crawl"""
+
+    def __init__(self):
+        self.cards = {False: 0, True: 0}
+        self.present = {False: {}, True: {}}
+
+    def add(self, card: Dict) -> None:
+        is_goalie = bool(card.get('is_goalie'))
+        self.cards[is_goalie] += 1
+        bad = set(invalid_required_fields(card, is_goalie))
+        counts = self.present[is_goalie]
+        for field in list(REQUIRED_FIELDS[is_goalie]) + ['name']:
+            if field not in bad:
+                counts[field] = counts.get(field, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return self.cards[False] + self.cards[True]
+
+    def ratios(self, is_goalie: bool) -> Dict[str, float]:
+        n = self.cards[is_goalie]
+        if not n:
+            return {}
+        counts = self.present[is_goalie]
+        return {field: counts.get(field, 0) / n for field in list(REQUIRED_FIELDS[is_goalie]) + ['name']}
+
+    def low_fields(self, ratio: float = COVERAGE_WARN_RATIO) -> List[str]:
+        """Fields whose coverage has dropped below ratio, e.g. ['skater:speed']"""
+        low = []
+        for is_goalie, label in ((False, 'skater'), (True, 'goalie')):
+            for field, value in self.ratios(is_goalie).items():
+                if value < ratio:
+                    low.append(f"{label}:{field}")
+        return low
+
+    def summary(self) -> str:
+        parts = []
+        for is_goalie, label in ((False, 'skater'), (True, 'goalie')):
+            ratios = self.ratios(is_goalie)
+            if not ratios:
+                continue
+            worst = sorted(ratios.items(), key=lambda item: item[1])[:3]
+            worst_text = ', '.join(f"{field} {value:.0%}" for field, value in worst)
+            parts.append(f"{label} {self.cards[is_goalie]} (heikoimmat: {worst_text})")
+        return '; '.join(parts) if parts else 'ei kortteja'
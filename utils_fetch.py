@@ -0,0 +1,176 @@
+"""
+Shared request pacing and DataTables page fetching
+Yksi prosessinlaajuinen nopeusrajoitin kaikille hakusäikeille, sivukoon automaattinen
+viritys ja loppujen sivujen rinnakkainen haku alkuperäisessä järjestyksessä
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List
+
+import requests
+
+# Same pace the scrapers used with time.sleep(0.3), now shared across threads
+DEFAULT_MIN_INTERVAL = 0.3
+
+# Page sizes tried in order after the first response
+PAGE_LENGTHS = (200, 500, 1000, 2000)
+
+# A larger page is kept only if it delivers at least this share of the previous rows/sec
+PAGE_LENGTH_MIN_SPEEDUP = 0.9
+
+
+class RateLimiter:
+    """Thread-safe minimum interval between requests"""
+
+    def __init__(self, min_interval: float = DEFAULT_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Process-wide limiter for nhlhutbuilder.com; every fetch helper uses it unless told otherwise
+SHARED_LIMITER = RateLimiter()
+
+
+def ordered_map(fn: Callable, items: Iterable, workers: int = 4, window: int = None) -> Iterator:
+    """Like executor.map but with at most `window` calls in flight, yielding results in input order"""
+    window = window or workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _timed_fetch(fetch: Callable[[int, int], Dict], start: int, length: int, limiter: RateLimiter):
+
+    limiter.wait()
+    began = time.perf_counter()
+    data = fetch(start, length) or {}
+    return data, time.perf_counter() - began
+
+
+def iter_datatables_pages(fetch: Callable[[int, int], Dict], workers: int = 4, limiter: RateLimiter = None,
+                          lengths: tuple = PAGE_LENGTHS,
+                          on_page: Callable[[int, int], None] = None) -> Iterator[List[Dict]]:
+    """Yield the `data` rows of every DataTables page in order.
+
+    fetch(start, length) must return the decoded JSON response. The first pages are
+    fetched one at a time with growing `length` until the server caps the page size or
+    rows/sec stops improving; the remaining offsets are then fetched concurrently by
+    `workers` threads under the shared rate limit. on_page(fetched, total) is called
+    after each page.
+    """
+    limiter = limiter or SHARED_LIMITER
+    fetched = 0
+
+    def emit(rows, total):
+        nonlocal fetched
+        fetched += len(rows)
+        if on_page:
+            on_page(fetched, total)
+        return rows
+
+    length = lengths[0]
+    data, elapsed = _timed_fetch(fetch, 0, length, limiter)
+    total = data.get('recordsFiltered') or data.get('recordsTotal') or 0
+    rows = data.get('data') or []
+    yield emit(rows, total)
+    if not rows:
+        return
+    if len(rows) < length and fetched < total:
+        # Server caps the page below our smallest size
+        length = len(rows)
+    best_rate = len(rows) / max(elapsed, 1e-6)
+
+    # Probe larger pages while they are accepted and not slower per row
+    for candidate in lengths[1:]:
+        if fetched >= total or candidate <= length:
+            break
+        data, elapsed = _timed_fetch(fetch, fetched, candidate, limiter)
+        rows = data.get('data') or []
+        yield emit(rows, total)
+        if not rows:
+            return
+        if len(rows) < candidate and fetched < total:
+            length = len(rows)
+            break
+        rate = len(rows) / max(elapsed, 1e-6)
+        if rate < best_rate * PAGE_LENGTH_MIN_SPEEDUP:
+            break
+        length, best_rate = candidate, max(rate, best_rate)
+
+    if fetched >= total:
+        return
+
+    def fetch_rows(start):
+        page, _ = _timed_fetch(fetch, start, length, limiter)
+        return page.get('data') or []
+
+    for rows in ordered_map(fetch_rows, range(fetched, total, length), workers=max(1, workers)):
+        yield emit(rows, total)
+
+
+def datatables_payload(columns: List[str], searches: Dict[str, str] = None, start: int = 0, length: int = 200,
+                       minimal: bool = False) -> Dict[str, object]:
+    """Build the DataTables form payload for `columns`, with per-column search values.
+
+    The full form declares name/searchable/orderable/search for every column, as the
+    site's own table does. minimal=True sends only columns[i][data], plus the search
+    keys for the columns in `searches`, which keeps projected requests small.
+    """
+    searches = searches or {}
+    payload = {
+        'draw': 1,
+        'start': start,
+        'length': length,
+        'search[value]': '',
+        'search[regex]': 'false',
+    }
+    for idx, name in enumerate(columns):
+        payload[f'columns[{idx}][data]'] = name
+        if minimal and name not in searches:
+            continue
+        if not minimal:
+            payload[f'columns[{idx}][name]'] = name
+        payload[f'columns[{idx}][searchable]'] = 'true'
+        if not minimal:
+            payload[f'columns[{idx}][orderable]'] = 'true'
+        payload[f'columns[{idx}][search][value]'] = searches.get(name, '')
+        payload[f'columns[{idx}][search][regex]'] = 'false'
+    return payload
+
+
+def project_columns(columns: List[str], searches: Dict[str, str] = None) -> List[str]:
+    """Requested columns followed by any searched column that was not requested"""
+    selected = list(columns)
+    selected.extend(name for name in (searches or {}) if name not in selected)
+    return selected
+
+
+def project_rows(rows: List[Dict], columns: List[str]) -> List[Dict]:
+    """Keep only `columns` from each row (in case the server returns more than asked for)"""
+    return [{name: row[name] for name in columns if name in row} for row in rows]
+
+
+def make_session(pool_size: int = 4):
+    """requests.Session whose connection pool fits pool_size worker threads"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
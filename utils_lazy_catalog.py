@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Lazy card catalog: in-memory summary table + on-demand full records
+Muistiin ladataan vain kevyt yhteenvetotaulu (nimi, overall, joukkue, kansallisuus, ...).
+Täydet kortit luetaan tarvittaessa NDJSON-tiedostosta tavusiirtymäindeksin avulla, joten
+käynnistyksen muistinkäyttö riippuu yhteenvedosta eikä kaikista tilastoista.
+Indeksi (master.summary) rakennetaan uudelleen, kun master.json tai muutosloki muuttuu; jos
+rakennus ei onnistu REBUILD_ATTEMPTS yrityksellä, käytetään viimeisintä valmista indeksiä.
+Avoimet katalogit huomaavat toisen instanssin uudelleenrakennuksen ja lataavat indeksin.
+30 000 kortilla muistia kuluu noin 39 MB, json.loadilla noin 86 MB.
+
+Usage:
+    python utils_lazy_catalog.py build        # master.json (+ change log) -> master.records.ndjson + master.summary
+"""
+
+import argparse
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from utils_card_store import card_key
+from utils_changelog import default_log_path, load_master
+from utils_snapshot import MARSHAL_VERSION, intern_players
+
+# Everything the list views, filters and slot displays read; other fields stay on disk
+SUMMARY_FIELDS = ('url', 'player_id', 'unique_id', 'is_goalie', 'name', 'full_name', 'player_name', 'overall',
+                  'card', 'nationality', 'team', 'league', 'position', 'hand', 'salary', 'image_url', 'card_image', 'image', 'card_art',
+                  'xfactors', 'x_factor', 'xfactor', 'superstar_ability', 'date_updated')
+
+SUMMARY_VERSION = 2
+
+# Index builds to try while master.json keeps changing underneath them
+REBUILD_ATTEMPTS = 3
+
+# Full records kept after reading them
+RECORD_CACHE_SIZE = 256
+
+
+def records_path(json_path: str) -> str:
+    root, _ = os.path.splitext(json_path)
+    return f'{root}.records.ndjson'
+
+
+def summary_path(json_path: str) -> str:
+    root, _ = os.path.splitext(json_path)
+    return f'{root}.summary'
+
+
+def _sources_signature(json_path: str) -> tuple:
+
+    signature = []
+    for path in (json_path, default_log_path(json_path)):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _replace(src: str, dst: str) -> None:
+
+    # On Windows the rename fails while a reader has dst open; readers only hold it briefly
+    for attempt in range(20):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == 19:
+                raise
+            time.sleep(0.05)
+
+
+def build_lazy_catalog(json_path: str = 'master.json') -> int:
+    """Write the records file and the summary/offset index for json_path; returns card count"""
+    source = _sources_signature(json_path)
+    players = load_master(json_path).get('players', [])
+    offsets = array('Q')
+    # Per-process temp names: two instances may rebuild at the same time
+    tmp_records = f'{records_path(json_path)}.{os.getpid()}.tmp'
+    with open(tmp_records, 'wb') as f:
+        for card in players:
+            offsets.append(f.tell())
+            f.write(json.dumps(card, ensure_ascii=False).encode('utf-8'))
+            f.write(b'\n')
+    summaries = [{field: card[field] for field in SUMMARY_FIELDS if field in card} for card in players]
+    intern_players({'players': summaries})
+    # The rename keeps mtime and size, so readers can tell which records file the offsets are for
+    payload = {'version': SUMMARY_VERSION, 'source': source, 'records': _file_signature(tmp_records),
+               'summaries': summaries, 'offsets': offsets.tobytes()}
+    tmp_summary = f'{summary_path(json_path)}.{os.getpid()}.tmp'
+    with open(tmp_summary, 'wb') as f:
+        f.write(marshal.dumps(payload, MARSHAL_VERSION))
+    # Records first: a summary is only ever published for a records file that exists
+    _replace(tmp_records, records_path(json_path))
+    _replace(tmp_summary, summary_path(json_path))
+    return len(players)
+
+
+def _read_summary(json_path: str, check_source: bool = True) -> Optional[Dict]:
+
+    try:
+        with open(summary_path(json_path), 'rb') as f:
+            payload = marshal.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if payload.get('version') != SUMMARY_VERSION or payload.get('records') != _file_signature(records_path(json_path)):
+        return None
+    if check_source and payload.get('source') != _sources_signature(json_path):
+        return None
+    return payload
+
+
+class LazyCatalog:
+    """Summary dicts for every card in memory; full cards read by byte offset when asked for.
+
+    The index is rebuilt on open whenever master.json or its change log changed since
+    it was written. The records file is opened per read, so another instance can
+    rebuild it meanwhile; the catalog then reloads the new index.
+    """
+
+    def __init__(self, json_path: str = 'master.json', cache_size: int = RECORD_CACHE_SIZE):
+        self.json_path = json_path
+        self.cache_size = cache_size
+        self.rebuilt = False
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+
+        payload = _read_summary(self.json_path)
+        for _ in range(REBUILD_ATTEMPTS):
+            if payload is not None:
+                break
+            build_lazy_catalog(self.json_path)
+            self.rebuilt = True
+            payload = _read_summary(self.json_path)
+        if payload is None:
+            # master.json kept changing while the index was built (a crawl is writing);
+            # the index just built is a consistent earlier state and a later open catches up
+            payload = _read_summary(self.json_path, check_source=False)
+            if payload is None:
+                raise RuntimeError(f"Could not build a readable index for {self.json_path}")
+        self.summaries: List[Dict] = payload['summaries']
+        self._records = payload['records']
+        self._offsets = array('Q')
+        self._offsets.frombytes(payload['offsets'])
+        self._rows = None
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self.summaries)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.summaries)
+
+    def urls(self) -> set:
+        return {s['url'] for s in self.summaries if s.get('url')}
+
+    def _row_of(self, summary: Dict) -> Optional[int]:
+
+        if self._rows is None:
+            self._rows = {card_key(s): row for row, s in enumerate(self.summaries)}
+        return self._rows.get(card_key(summary))
+
+    def _read(self, row: int) -> tuple:
+
+        # (row, card): the row changes if the index had to be reloaded
+        for _ in range(REBUILD_ATTEMPTS):
+            try:
+                with open(records_path(self.json_path), 'rb') as f:
+                    st = os.fstat(f.fileno())
+                    if (st.st_mtime_ns, st.st_size) == tuple(self._records):
+                        f.seek(self._offsets[row])
+                        return row, json.loads(f.readline())
+            except FileNotFoundError:
+                pass
+            # Another instance rebuilt the files: reload and find the same card in the new index
+            summary = self.summaries[row]
+            self._load()
+            row = self._row_of(summary)
+            if row is None:
+                return None, None
+        raise RuntimeError(f"{records_path(self.json_path)} kept changing while reading")
+
+    def record(self, row: int) -> Optional[Dict]:
+        """Full card at row, read from disk unless recently used (None if another instance
+        rebuilt the index and the card is no longer in it)"""
+        with self._lock:
+            card = self._cache.get(row)
+            if card is not None:
+                self._cache.move_to_end(row)
+                return card
+            row, card = self._read(row)
+            if card is not None:
+                self._cache[row] = card
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return card
+
+    def record_for(self, summary: Dict) -> Optional[Dict]:
+        """Full card for a summary (or any card with the same identity)"""
+        row = self._row_of(summary)
+        return None if row is None else self.record(row)
+
+    def close(self) -> None:
+        # Nothing is held open between reads; kept for the context-manager protocol
+        self._cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Build the lazy catalog index for master.json')
+    ap.add_argument('command', choices=['build'])
+    ap.add_argument('--master', default='master.json', help='Master data (default: master.json)')
+    args = ap.parse_args()
+
+    count = build_lazy_catalog(args.master)
+    print(f"Indexed {count} cards: {summary_path(args.master)}, {records_path(args.master)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Memory-resident master data cache
+Master-data pidetään muistissa ja luetaan levyltä uudelleen vain, kun master.json tai sen
+muutosloki on oikeasti muuttunut (mtime, koko tai inode).
+Monitorit päivittävät välimuistin omien kirjoitustensa jälkeen (update()), joten ne eivät
+aiheuta turhaa uudelleenjäsennystä.
+"""
+
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+from utils_changelog import default_log_path, load_master
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class MasterCache:
+    """Parsed master data for one snapshot path, validated against the files on disk.
+
+    The snapshot and its change log are both watched, so appends by another process
+    are picked up. A component that changes the returned data and persists it calls
+    update() so its own write does not trigger a reparse.
+    """
+
+    def __init__(self, snapshot_path: str = 'master.json', loader: Callable[[str], Dict] = load_master):
+        self.snapshot_path = snapshot_path
+        self.watch_paths = (snapshot_path, default_log_path(snapshot_path))
+        self.loader = loader
+        self.loads = 0
+        self._lock = threading.RLock()
+        self._data: Optional[Dict] = None
+        self._signature = None
+
+    def _current_signature(self) -> tuple:
+
+        return tuple(_file_signature(path) for path in self.watch_paths)
+
+    def is_stale(self) -> bool:
+        """True if nothing is cached yet or a watched file changed since it was read"""
+        with self._lock:
+            return self._data is None or self._signature != self._current_signature()
+
+    def get(self) -> Dict:
+        """Current master data; parses the files only when they changed on disk"""
+        with self._lock:
+            signature = self._current_signature()
+            if self._data is None or signature != self._signature:
+                # Stat before reading: a write that lands mid-read changes the signature
+                # again, so the next call reloads instead of trusting a torn view
+                self._data = self.loader(self.snapshot_path)
+                self._signature = signature
+                self.loads += 1
+            return self._data
+
+    def count(self) -> int:
+        return len(self.get().get('players', []))
+
+    def update(self, data: Dict) -> None:
+        """Adopt data as the on-disk state right after this process wrote it"""
+        with self._lock:
+            self._data = data
+            self._signature = self._current_signature()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data = None
+            self._signature = None
+
+
+_shared: Dict[str, MasterCache] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(snapshot_path: str = 'master.json') -> MasterCache:
+    """Process-wide cache for snapshot_path, so every component reuses one parsed copy"""
+    key = os.path.abspath(snapshot_path)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = MasterCache(snapshot_path)
+        return _shared[key]
@@ -0,0 +1,121 @@
+"""
+Hash-indexed card merge
+Uudet kortit yhdistetään master-dataan hajautusindeksien avulla (unique_id,
+player_id + is_goalie, url) ja kenttäkohtaisilla konfliktisäännöillä.
+Uudempi date_updated voittaa, tyhjä arvo ei korvaa täytettyä, ja X-Factorit, korttikuva
+sekä tallennettu date_added säilyvät.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+# Fields filled in after the card page is parsed; an empty incoming value never replaces them
+ENRICHED_FIELDS = ('xfactors', 'card_art', 'image_url', 'full_name')
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == '' or value == [] or value == {}
+
+
+class MasterIndex:
+    """Positions of cards in a players list by unique_id, (player_id, is_goalie) and url"""
+
+    def __init__(self, players: List[Dict]):
+        self.players = players
+        self.by_unique_id = {}
+        self.by_player = {}
+        self.by_url = {}
+        for position, card in enumerate(players):
+            self._add(card, position)
+
+    def _add(self, card: Dict, position: int) -> None:
+
+        # setdefault: the first card wins, like the old linear scan
+        if card.get('unique_id'):
+            self.by_unique_id.setdefault(card['unique_id'], position)
+        if card.get('player_id') is not None:
+            self.by_player.setdefault((card['player_id'], bool(card.get('is_goalie'))), position)
+        if card.get('url'):
+            self.by_url.setdefault(card['url'], position)
+
+    def find(self, card: Dict) -> Optional[int]:
+        """Position of the stored card with the same identity, checked in order of strength"""
+        if card.get('unique_id') and card['unique_id'] in self.by_unique_id:
+            return self.by_unique_id[card['unique_id']]
+        if card.get('player_id') is not None:
+            position = self.by_player.get((card['player_id'], bool(card.get('is_goalie'))))
+            if position is not None:
+                return position
+        if card.get('url'):
+            return self.by_url.get(card['url'])
+        return None
+
+    def append(self, card: Dict) -> int:
+        self.players.append(card)
+        position = len(self.players) - 1
+        self._add(card, position)
+        return position
+
+    def replace(self, position: int, card: Dict) -> None:
+        self.players[position] = card
+        self._add(card, position)
+
+
+def merge_card(existing: Dict, incoming: Dict) -> Dict:
+    """Field-level merge of two versions of the same card.
+
+    The version with the newer date_updated wins (incoming on a tie, as it is the fresher
+    fetch); the other only fills fields the winner lacks. Enriched fields such as
+    X-Factors are never replaced by an empty value, and the stored date_added is kept.
+    """
+    incoming_newer = str(incoming.get('date_updated') or '') >= str(existing.get('date_updated') or '')
+    winner, other = (incoming, existing) if incoming_newer else (existing, incoming)
+    merged = dict(other)
+    for field, value in winner.items():
+        if _is_empty(value) and not _is_empty(other.get(field)):
+            continue
+        merged[field] = value
+    for field in ENRICHED_FIELDS:
+        if _is_empty(merged.get(field)) and not _is_empty(existing.get(field)):
+            merged[field] = existing[field]
+    # The monitors stamp fetched cards with today's date_added and often a '0000-00-00'
+    # date_updated, so on a tie the incoming date_added would overwrite the real one
+    if not _is_empty(existing.get('date_added')):
+        merged['date_added'] = existing['date_added']
+    return merged
+
+
+class MergeResult:
+    """Cards grouped by what the merge did with them"""
+
+    def __init__(self):
+        self.added: List[Dict] = []
+        self.updated: List[Dict] = []
+        self.unchanged: List[Dict] = []
+
+    @property
+    def changed(self) -> List[Dict]:
+        """Added and updated cards, i.e. what has to be persisted"""
+        return self.added + self.updated
+
+    def summary(self) -> str:
+        return f"lisatty {len(self.added)}, paivitetty {len(self.updated)}, ennallaan {len(self.unchanged)}"
+
+
+def merge_cards(players: List[Dict], cards: Iterable[Dict], index: MasterIndex = None) -> MergeResult:
+    """Upsert cards into players in place; O(len(cards)) once the index exists"""
+    index = index or MasterIndex(players)
+    result = MergeResult()
+    for card in cards:
+        position = index.find(card)
+        if position is None:
+            index.append(card)
+            result.added.append(card)
+            continue
+        existing = players[position]
+        merged = merge_card(existing, card)
+        if merged == existing:
+            result.unchanged.append(existing)
+        else:
+            index.replace(position, merged)
+            result.updated.append(merged)
+    return result
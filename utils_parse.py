@@ -0,0 +1,98 @@
+"""
+Listing page parsing helpers
+Nopeat poiminnat find_cards.php vastauksista (korttien URLit ja entry_count)
+"""
+
+import html as html_lib
+import re
+from typing import List, Optional
+
+from bs4 import BeautifulSoup
+
+BASE_URL = 'https://nhlhutbuilder.com/'
+
+# <div class="... other_card_container ..."> ... <a ... href="player-stats.php?id=123">
+# The anchor must appear before the first closing </div> of the container,
+# which is how every listing page is laid out. Anything else goes to the tree parser.
+_CONTAINER_RE = re.compile(
+    r'<div\b[^>]*?\bclass\s*=\s*["\'][^"\']*(?<![\w-])other_card_container(?![\w-])[^"\']*["\'][^>]*>',
+    re.IGNORECASE,
+)
+_CONTAINER_ANCHOR_RE = re.compile(
+    r'(?:(?!</div\s*>).)*?<a\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\')',
+    re.IGNORECASE | re.DOTALL,
+)
+_ENTRY_COUNT_RE = re.compile(
+    r'<div\b[^>]*?\bid\s*=\s*["\']entry_count["\'][^>]*>(.*?)</div\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_TAG_RE = re.compile(r'<[^>]*>')
+
+
+def _card_urls_fast(html: str, base_url: str) -> List[str]:
+
+    urls = []
+    for match in _CONTAINER_RE.finditer(html):
+        anchor = _CONTAINER_ANCHOR_RE.match(html, match.end())
+        if not anchor:
+            # Unexpected container shape, let the tree parser decide
+            return []
+        href = anchor.group(1) if anchor.group(1) is not None else anchor.group(2)
+        if href:
+            urls.append(f'{base_url}{html_lib.unescape(href)}')
+    return urls
+
+
+def _card_urls_soup(html: str, base_url: str) -> List[str]:
+
+    soup = BeautifulSoup(html, 'html.parser')
+    urls = []
+    for container in soup.find_all('div', class_='other_card_container'):
+        link = container.find('a', href=True)
+        if link:
+            href = link.get('href')
+            if href:
+                urls.append(f'{base_url}{href}')
+    return urls
+
+
+def extract_card_urls(html: str, base_url: str = BASE_URL) -> List[str]:
+    """Collect card URLs from other_card_container divs (regex first, BeautifulSoup as fallback)"""
+    if not html:
+        return []
+    urls = _card_urls_fast(html, base_url)
+    if urls:
+        return urls
+    return _card_urls_soup(html, base_url)
+
+
+def _entry_count_text_fast(html: str) -> Optional[str]:
+
+    match = _ENTRY_COUNT_RE.search(html)
+    if not match:
+        return None
+    inner = match.group(1)
+    if re.search(r'<div\b', inner, re.IGNORECASE):
+        # Nested div would end the match too early
+        return None
+    return html_lib.unescape(_TAG_RE.sub('', inner)).strip()
+
+
+def _entry_count_text_soup(html: str) -> Optional[str]:
+
+    soup = BeautifulSoup(html, 'html.parser')
+    entry_count_div = soup.find('div', id='entry_count')
+    if not entry_count_div:
+        return None
+    return entry_count_div.get_text().strip()
+
+
+def extract_entry_count_text(html: str) -> Optional[str]:
+    """Return the text of the entry_count div, or None if the page has none"""
+    if not html:
+        return None
+    text = _entry_count_text_fast(html)
+    if text:
+        return text
+    return _entry_count_text_soup(html)
+
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Columnar memory-mapped stat matrix
+Korttien numeeriset ominaisuudet kirjoitetaan sarakkeittain tyypitettyinä taulukkoina
+muistikartoitettuun tiedostoon (master.stats). Suodatukset, järjestykset ja koosteet
+voidaan tehdä NumPyllä ilman sanakirjojen läpikäyntiä, ja usea prosessi voi jakaa
+saman datan kopioimatta. NumPy on valinnainen; ilman sitä sarakkeet ovat memoryview-olioita.
+Kansallisuus, joukkue, liiga, pelipaikka, kortti ja käsi tallennetaan uint16-koodeina, ja
+korttiavainten lista toimii tunniste → rivi -hakemistona.
+
+Usage:
+    python utils_stat_matrix.py build                    # master.json -> master.stats
+    python utils_stat_matrix.py top speed --nationality Finland --n 10
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional
+
+from utils_card_store import card_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_STATS_PATH = 'master.stats'
+
+STATS_MAGIC = b'HUTSTAT1'
+
+SKATER_STATS = ('acceleration', 'agility', 'balance', 'endurance', 'speed', 'slap_shot_accuracy',
+                'slap_shot_power', 'wrist_shot_accuracy', 'wrist_shot_power', 'deking', 'off_awareness',
+                'hand_eye', 'passing', 'puck_control', 'body_checking', 'strength', 'aggression', 'durability',
+                'fighting_skill', 'def_awareness', 'shot_blocking', 'stick_checking', 'faceoffs', 'discipline')
+
+GOALIE_STATS = ('glove_high', 'glove_low', 'stick_high', 'stick_low', 'shot_recovery', 'positioning',
+                'breakaway', 'vision', 'poke_check', 'rebound_control')
+
+# float32 columns; a card without the value gets NaN (salary stays exact below 16.7M)
+NUMERIC_COLUMNS = ('player_id', 'is_goalie', 'overall', 'aOVR', 'salary', 'height', 'weight') + SKATER_STATS + tuple(
+    s for s in GOALIE_STATS if s not in SKATER_STATS)
+
+# uint16 codes into a per-column string table; code 0 means missing
+CATEGORY_COLUMNS = ('nationality', 'team', 'league', 'position', 'card', 'hand')
+
+
+def _as_float(value) -> float:
+
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _align(offset: int, to: int = 8) -> int:
+
+    return (offset + to - 1) // to * to
+
+
+def build_stat_matrix(players: List[Dict], path: str = DEFAULT_STATS_PATH) -> int:
+    """Write players as a column file: magic, 4-byte header length, JSON header, aligned columns.
+
+    The header holds the row count, each column's dtype and offset, the category
+    string tables and the card keys in row order (the id -> row map).
+    """
+    columns = {}
+    for name in NUMERIC_COLUMNS:
+        columns[name] = array('f', (_as_float(card.get(name)) for card in players))
+    tables = {}
+    for name in CATEGORY_COLUMNS:
+        codes = {}
+        values = array('H')
+        for card in players:
+            value = card.get(name)
+            values.append(codes.setdefault(value, len(codes) + 1) if value not in (None, '') else 0)
+        tables[name] = [value for value, _ in sorted(codes.items(), key=lambda kv: kv[1])]
+        columns[name] = values
+
+    layout, offset = {}, 0
+    for name, values in columns.items():
+        offset = _align(offset)
+        layout[name] = {'dtype': 'f4' if values.typecode == 'f' else 'u2', 'offset': offset}
+        offset += len(values) * values.itemsize
+    header = json.dumps({'rows': len(players), 'columns': layout, 'categories': tables,
+                         'keys': [card_key(card) for card in players]}, ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(STATS_MAGIC) + 4 + len(header))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(STATS_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for name, values in columns.items():
+            f.write(b'\0' * (data_start + layout[name]['offset'] - f.tell()))
+            if sys.byteorder != 'little':
+                values = array(values.typecode, values)
+                values.byteswap()
+            values.tofile(f)
+    os.replace(tmp_path, path)
+    return len(players)
+
+
+class StatMatrix:
+    """Read-only view of a stat file. Columns are NumPy arrays backed by the shared
+    mapping (memoryviews without NumPy); nothing is copied until you index into them."""
+
+    def __init__(self, path: str = DEFAULT_STATS_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(STATS_MAGIC)] != STATS_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a stat matrix file")
+        (header_len,) = struct.unpack_from('<I', self._mmap, len(STATS_MAGIC))
+        start = len(STATS_MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_len].decode('utf-8'))
+        self.rows = header['rows']
+        self.layout = header['columns']
+        self.categories = header['categories']
+        self.keys = header['keys']
+        self._data_start = _align(start + header_len)
+        self._row_of = None
+
+    def column(self, name: str):
+        spec = self.layout[name]
+        offset = self._data_start + spec['offset']
+        if np is not None:
+            return np.frombuffer(self._mmap, dtype=f"<{spec['dtype']}", count=self.rows, offset=offset)
+        itemsize = 4 if spec['dtype'] == 'f4' else 2
+        view = memoryview(self._mmap)[offset:offset + self.rows * itemsize]
+        return view.cast('f' if spec['dtype'] == 'f4' else 'H')
+
+    def code(self, name: str, value: str) -> int:
+        """Code of a category value in column name (0 if no card has it)"""
+        try:
+            return self.categories[name].index(value) + 1
+        except ValueError:
+            return 0
+
+    def row_of(self, card: Dict) -> Optional[int]:
+        if self._row_of is None:
+            self._row_of = {key: row for row, key in enumerate(self.keys)}
+        return self._row_of.get(card_key(card))
+
+    def mask(self, **equals):
+        """Rows where every given category column equals its value (NumPy bool array)"""
+        if np is None:
+            raise RuntimeError('mask() needs NumPy; use top() or column() without it')
+        selected = np.ones(self.rows, dtype=bool)
+        for name, value in equals.items():
+            if value is not None:
+                selected &= self.column(name) == self.code(name, value)
+        return selected
+
+    def top(self, stat: str, n: int = 10, **equals) -> List[tuple]:
+        """[(card_key, value)] of the n highest values of stat among rows matching equals"""
+        if np is None:
+            values = self.column(stat)
+            codes = {name: (self.column(name), self.code(name, value)) for name, value in equals.items()
+                     if value is not None}
+            rows = [row for row in range(self.rows) if not math.isnan(values[row])
+                    and all(column[row] == code for column, code in codes.values())]
+            rows.sort(key=lambda row: -values[row])
+            return [(self.keys[row], values[row]) for row in rows[:n]]
+        values = self.column(stat)
+        rows = np.flatnonzero(self.mask(**equals) & ~np.isnan(values))
+        rows = rows[np.argsort(-values[rows], kind='stable')[:n]]
+        return [(self.keys[row], float(values[row])) for row in rows]
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Build or query the columnar stat matrix (master.stats)')
+    ap.add_argument('command', choices=['build', 'top'])
+    ap.add_argument('stat', nargs='?', default='overall', help='top: numeric column to rank by')
+    ap.add_argument('--master', default='master.json', help='build: source master data (default: master.json)')
+    ap.add_argument('--out', default=DEFAULT_STATS_PATH, help='Stat file (default: master.stats)')
+    ap.add_argument('--n', type=int, default=10)
+    for name in CATEGORY_COLUMNS:
+        ap.add_argument(f'--{name}', help=f'top: only cards with this {name}')
+    args = ap.parse_args()
+
+    if args.command == 'build':
+        from utils_changelog import load_master
+        count = build_stat_matrix(load_master(args.master).get('players', []), args.out)
+        print(f"Wrote {count} cards x {len(NUMERIC_COLUMNS) + len(CATEGORY_COLUMNS)} columns to {args.out}")
+        return 0
+    try:
+        matrix = StatMatrix(args.out)
+    except (OSError, ValueError) as e:
+        print(f"Failed: {e}")
+        return 1
+    with matrix:
+        if args.stat not in matrix.layout:
+            print(f"Failed: unknown column {args.stat}")
+            return 1
+        for key, value in matrix.top(args.stat, args.n, **{name: getattr(args, name) for name in CATEGORY_COLUMNS}):
+            print(f"{key:24s} {value:g}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
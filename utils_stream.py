@@ -0,0 +1,144 @@
+"""
+Streaming scrape output
+Siivotut sivut kirjoitetaan heti NDJSON-välitiedostoon, ja lopullinen JSON-taulukko
+kirjoitetaan siitä rivi kerrallaan, joten muistinkäyttö ei kasva katalogin mukana
+"""
+
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from utils_clean import PARALLEL_MIN_ROWS, clean_rows, clean_rows_parallel
+
+
+def partial_path(out_path: str) -> str:
+    """NDJSON file that holds rows written so far for out_path"""
+    return f'{out_path}.partial.ndjson'
+
+
+def clean_pages(pages: Iterable[List[Dict]], workers: int = 1) -> Iterator[List[Dict]]:
+    """Clean raw DataTables pages as they arrive, yielding cleaned rows in order.
+
+    With workers == 1 every page is cleaned on its own against a shared memo.
+    Otherwise pages are buffered up to PARALLEL_MIN_ROWS rows and each buffer goes
+    through clean_rows_parallel, so memory stays bounded by the buffer size.
+    """
+    if workers == 1:
+        memo = {}
+        for rows in pages:
+            yield clean_rows(rows, memo)
+        return
+    buffer = []
+    for rows in pages:
+        buffer.extend(rows)
+        if len(buffer) >= PARALLEL_MIN_ROWS:
+            yield clean_rows_parallel(buffer, workers=workers)
+            buffer = []
+    if buffer:
+        yield clean_rows_parallel(buffer, workers=workers)
+
+
+def append_ndjson(f, rows: Iterable[Dict]) -> int:
+    """Append rows to an open NDJSON file and force them to disk; returns rows written"""
+    count = 0
+    for row in rows:
+        f.write(json.dumps(row, ensure_ascii=False))
+        f.write('\n')
+        count += 1
+    f.flush()
+    os.fsync(f.fileno())
+    return count
+
+
+def iter_ndjson(path: str) -> Iterator[Dict]:
+    """Yield rows from an NDJSON file, skipping a torn last line left by a crash"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def write_json_array(path: str, rows: Iterable[Dict], indent: int = 2) -> int:
+    """Write rows as a JSON array one element at a time (same text as json.dump(list, indent=indent)).
+
+    The array goes to a temporary file first and replaces path only when complete.
+    """
+    pad = ' ' * indent
+    tmp_path = f'{path}.tmp'
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            text = json.dumps(row, ensure_ascii=False, indent=indent)
+            f.write('[\n' if count == 0 else ',\n')
+            f.write(pad + text.replace('\n', '\n' + pad))
+            count += 1
+        f.write('\n]' if count else '[]')
+    os.replace(tmp_path, path)
+    return count
+
+
+def stream_to_json(pages: Iterable[List[Dict]], out_path: str, keep: Callable[[Dict], bool] = None,
+                   workers: int = 1, progress: Callable[[int], None] = None) -> int:
+    """Fetch -> clean -> filter -> append NDJSON, then write out_path as a JSON array.
+
+    If anything fails midway, the rows saved so far stay in partial_path(out_path).
+    Returns the number of rows written.
+    """
+    ndjson_path = partial_path(out_path)
+    saved = 0
+    with open(ndjson_path, 'w', encoding='utf-8') as f:
+        for cleaned in clean_pages(pages, workers):
+            if keep is not None:
+                cleaned = [r for r in cleaned if keep(r)]
+            saved += append_ndjson(f, cleaned)
+            if progress:
+                progress(saved)
+    count = write_json_array(out_path, iter_ndjson(ndjson_path))
+    os.remove(ndjson_path)
+    return count
+
+
+class PartitionWriter:
+    """Append rows to many NDJSON partition files, keeping at most max_open handles open"""
+
+    def __init__(self, work_dir: str, max_open: int = 64):
+        self.work_dir = work_dir
+        self.max_open = max_open
+        self.counts = {}
+        self._handles = {}
+        os.makedirs(work_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.work_dir, f'{key}.ndjson')
+
+    def _handle(self, key: str):
+
+        f = self._handles.pop(key, None)
+        if f is None:
+            if len(self._handles) >= self.max_open:
+                # dicts keep insertion order, so the first handle is the least recently used
+                oldest = next(iter(self._handles))
+                self._handles.pop(oldest).close()
+            path = self.path(key)
+            if key not in self.counts:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            f = open(path, 'a' if key in self.counts else 'w', encoding='utf-8')
+        self._handles[key] = f
+        return f
+
+    def write(self, keys: Iterable[str], row: Dict) -> None:
+        """Append row to every partition in keys (e.g. 'nationality/finland'), serializing it once"""
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        for key in keys:
+            self._handle(key).write(line)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def close(self) -> None:
+        for f in self._handles.values():
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        self._handles = {}
@@ -0,0 +1,97 @@
+"""
+Single-writer lock for master data
+Vain yksi prosessi (tai säie) kerrallaan saa kirjoittaa master.json:iin tai sen
+muutoslokiin. Lukko on käyttöjärjestelmän tiedostolukko master.json.lock-tiedostossa, joten
+se vapautuu automaattisesti myös prosessin kaatuessa.
+Lukkoa pitävät muutoslokin kirjoitukset ja tiivistys, utils_card_store.py export ja
+commit_cards(), joka yhdistää uudet kortit viimeisimpään snapshotiin ja muutoslokiin.
+"""
+
+import os
+import socket
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Long enough to wait out a compaction of a large catalog
+DEFAULT_TIMEOUT = 120.0
+
+
+def lock_path(target_path: str) -> str:
+    return f'{target_path}.lock'
+
+
+def _try_lock(fd: int) -> bool:
+
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int) -> None:
+
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class WriterLock:
+    """Exclusive, blocking lock on <target>.lock, usable as a context manager.
+
+    Each acquire opens its own descriptor, so threads of one process exclude each
+    other as well. Not reentrant. The holder's pid and host are written into the
+    file so a timeout can say who is holding it.
+    """
+
+    def __init__(self, target_path: str, timeout: float = DEFAULT_TIMEOUT, poll: float = 0.05):
+        self.path = lock_path(target_path)
+        self.timeout = timeout
+        self.poll = poll
+        self._fd = None
+
+    def holder(self) -> str:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or 'unknown'
+        except OSError:
+            return 'unknown'
+
+    def acquire(self) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                os.close(fd)
+                raise TimeoutError(f"{self.path} is held by {self.holder()} (waited {self.timeout:.0f} s)")
+            time.sleep(self.poll)
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, f"pid {os.getpid()} on {socket.gethostname()} since {time.strftime('%H:%M:%S')}\n".encode('utf-8'))
+        self._fd = fd
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                _unlock(fd)
+            finally:
+                os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
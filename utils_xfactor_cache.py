@@ -0,0 +1,102 @@
+"""
+Persistent X-Factor cache
+X-Factorit muuttuvat harvoin, joten ne tallennetaan pelaajakohtaisesti (player_id, is_goalie)
+hakuaikaleiman kanssa ja haetaan verkosta vasta kun merkintä on vanhentunut
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CACHE_PATH = 'xfactor_cache.json'
+
+# X-Factors are reassigned rarely; a week keeps promo changes from going stale for long
+DEFAULT_TTL = 7 * 24 * 3600
+
+# New cards often get their X-Factors a little after release, so "none" is rechecked sooner.
+# Failed fetches are never cached (fetchers return None for them).
+EMPTY_TTL = 24 * 3600
+
+
+class XFactorCache:
+    """X-Factor lists keyed by (player_id, is_goalie), stored as JSON with fetch timestamps.
+
+    `variant` separates differently shaped records for the same player, e.g. the
+    tier analyzer's detailed abilities. Safe to share between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL, empty_ttl: float = EMPTY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: Dict[str, Dict] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get('entries', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            # Corrupt cache only costs refetches
+            self._entries = {}
+
+    @staticmethod
+    def key(player_id, is_goalie: bool, variant: str = None) -> str:
+        key = f"{'G' if is_goalie else 'S'}{player_id}"
+        return f'{key}:{variant}' if variant else key
+
+    def get(self, player_id, is_goalie: bool, variant: str = None) -> Optional[List[Dict]]:
+        """Cached X-Factors, or None if missing or older than the TTL"""
+        with self._lock:
+            entry = self._entries.get(self.key(player_id, is_goalie, variant))
+            if entry is not None:
+                ttl = self.ttl if entry['xfactors'] else self.empty_ttl
+                if time.time() - entry['fetched_at'] < ttl:
+                    self.hits += 1
+                    return entry['xfactors']
+            self.misses += 1
+            return None
+
+    def put(self, player_id, is_goalie: bool, xfactors: Optional[List[Dict]], variant: str = None) -> None:
+        """Store a fetch result; None (a failed fetch) is ignored so the next lookup retries"""
+        if xfactors is None:
+            return
+        with self._lock:
+            self._entries[self.key(player_id, is_goalie, variant)] = {
+                'fetched_at': time.time(),
+                'xfactors': xfactors,
+            }
+            self._dirty = True
+
+    def get_or_fetch(self, player_id, is_goalie: bool, fetch: Callable[[], Optional[List[Dict]]],
+                     variant: str = None, delay: float = 0) -> Optional[List[Dict]]:
+        """Return cached X-Factors or call fetch() and store its result. fetch() returns None
+        on failure, which is passed through uncached. `delay` seconds are slept after each
+        fetch to pace requests; cache hits return immediately."""
+        xfactors = self.get(player_id, is_goalie, variant)
+        if xfactors is None:
+            xfactors = fetch()
+            self.put(player_id, is_goalie, xfactors, variant)
+            if delay:
+                time.sleep(delay)
+        return xfactors
+
+    def save(self) -> None:
+        """Write the cache atomically if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': 1, 'entries': self._entries}
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def stats(self) -> str:
+        return f"{self.hits} osumaa, {self.misses} verkkohakua"